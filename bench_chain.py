@@ -0,0 +1,76 @@
+import time
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+
+import chain
+
+# ==========================================
+# chain.py 마이크로 벤치마크
+# ==========================================
+# LLM / OpenSearch 호출 없이 라우팅 단계의 요청당 오버헤드만 측정합니다.
+
+
+def legacy_question_route(info, question, retrieved_data):
+    # 기존 classification_route 처럼 요청마다 프롬프트/체인/클로저를 새로 구성
+    summarize_prompt = PromptTemplate.from_template(chain.summarize_prompt.template)
+    summarize_chain = summarize_prompt | chain.llm | StrOutputParser()
+    prompt_template = PromptTemplate(
+        template=chain.answer_prompt,
+        input_variables=["question", "retrieved_data"]
+    )
+
+    def render_prompt(inputs):
+        return prompt_template.format(**inputs)
+
+    question_chain = (
+        {"question": lambda x: question, "retrieved_data": lambda x: retrieved_data}
+        | RunnableLambda(render_prompt)
+        | chain.llm
+        | StrOutputParser()
+    )
+    return summarize_chain, RunnableParallel(answer=question_chain, retrieved_data=lambda x: retrieved_data)
+
+
+def benchmark_route_overhead(n=20000):
+    info = {"topic": "Question", "query": "rg 라인 수율이 왜 떨어졌나요?"}
+    retrieved_data = [{"retrieved_title": "doc", "retrieved_answer": "text", "score": 1.0, "url": "url"}]
+
+    start = time.perf_counter()
+    for _ in range(n):
+        legacy_question_route(info, "요약된 질문", retrieved_data)
+    legacy = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for _ in range(n):
+        chain.classification_route(info)
+    compiled = (time.perf_counter() - start) / n
+
+    print(f"[route 구성] legacy: {legacy * 1e6:.1f} us/req ({1 / legacy:,.0f} req/s)")
+    print(f"[route 구성] compiled: {compiled * 1e6:.2f} us/req ({1 / compiled:,.0f} req/s)")
+    return {"legacy_us": legacy * 1e6, "compiled_us": compiled * 1e6}
+
+
+def compare_retrieval_latency(queries, repeat=3):
+    """같은 질의로 neural(kNN 단독) 과 hybrid(BM25 + kNN, _msearch) 검색 지연시간을 비교합니다."""
+    results = {}
+    for mode in ("neural", "hybrid"):
+        latencies = []
+        for _ in range(repeat):
+            for query in queries:
+                start = time.perf_counter()
+                chain.retriever(query, chain.embedding_model_id, chain.top_n, mode=mode)
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        results[mode] = {
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        }
+        print(f"[{mode}] p50 {results[mode]['p50_ms']:.1f} ms / p95 {results[mode]['p95_ms']:.1f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_route_overhead()
+    compare_retrieval_latency(["rg 라인 수율", "cp 제품 클레임 이력", "4ABCD12345 랏 grade 변경"])
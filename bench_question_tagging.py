@@ -0,0 +1,119 @@
+import random
+import re
+import sys
+import time
+
+from question_tagging import ACTION_RULES, ENTITY_PATTERNS, rewrite, tag_entities
+
+# ==========================================
+# 질문 정규식 태깅 벤치마크
+# ==========================================
+# 과거 질문 전체(약 100만 건)를 분석용으로 다시 태깅/재작성할 때의 처리량을 비교합니다.
+# 사용법: python bench_question_tagging.py [질문 파일(한 줄에 하나)] [건수]
+# 파일이 없으면 합성 질문을 사용합니다.
+
+
+def legacy_regex_tagging(text):
+    # 기존 q_improvement.regex_tagging: 패턴별 findall + 매치마다 전체 문자열 replace
+    tags = []
+    for tag_type, pattern in ENTITY_PATTERNS.items():
+        matches = re.findall(pattern, text)
+        for match in matches:
+            tags.append({"type": tag_type, "value": match})
+            text = text.replace(match, f"@{tag_type}({match})")
+    return text, tags
+
+
+def legacy_rewrite_question(original_text, entity_tags):
+    # 기존 q_improvement.rewrite_question: 태그마다 전체 문자열 replace + 정규식 정리 3회
+    rewritten = original_text
+    for tag in entity_tags:
+        value = tag["value"]
+        tag_type = tag["type"]
+        action = ACTION_RULES.get(tag_type, {}).get("action", "keep")
+        if action == "remove":
+            rewritten = rewritten.replace(value, "")
+        elif action == "generalize":
+            rewritten = rewritten.replace(value, ACTION_RULES[tag_type]["replacement"])
+    rewritten = re.sub(r'\s+', ' ', rewritten)
+    rewritten = re.sub(r'\(\s*\)', '', rewritten)
+    rewritten = re.sub(r'\s+([?.!,])', r'\1', rewritten)
+    return rewritten.strip()
+
+
+TEMPLATES = [
+    "기안 번호 {proposal} 에서 {lot}(랏코드)에 대해 grade 변경이 필요한데 어떻게 하나요?",
+    "{tool} 설비 PM 이후 {tool} 알람이 계속 뜹니다. 조치 방법 알려주세요.",
+    "{proposal} 기안 승인 후 {tool} 적용 일정이 궁금합니다.",
+    "rg 라인 수율이 왜 떨어졌나요?",
+    "cp 제품 클레임 이력 확인은 어디서 하나요?",
+]
+
+
+# LLM 태거가 돌려주는 것과 같은 위치 없는 LOT_ID 태그를 만들기 위한 패턴
+LOT_RE = re.compile(r"\b[46](?=[A-Z0-9]{0,8}[A-Z])[A-Z0-9]{9}\b")
+
+
+def synthetic_questions(n, seed=0):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        questions.append(rng.choice(TEMPLATES).format(
+            proposal=f"{''.join(rng.choices('abcdefgh', k=3))}_{rng.randint(0, 9999):04d}_{rng.randint(0, 9999):04d}",
+            tool=f"EQ{rng.randint(0, 9999):04d}",
+            lot=f"4ABCD{rng.randint(0, 99999):05d}",
+        ))
+    return questions
+
+
+def run(fn, questions):
+    start = time.perf_counter()
+    for question in questions:
+        fn(question)
+    return time.perf_counter() - start
+
+
+def benchmark(questions):
+    n = len(questions)
+    legacy = run(legacy_regex_tagging, questions)
+    compiled = run(tag_entities, questions)
+    print(f"[{n:,}건] legacy: {legacy:.2f}s ({n / legacy:,.0f} q/s)")
+    print(f"[{n:,}건] compiled: {compiled:.2f}s ({n / compiled:,.0f} q/s) x{legacy / compiled:.1f}")
+
+    # 같은 값이 여러 번 나오는 질문에서 기존 방식은 이중 태깅(@T(@T(x)))이 생김
+    differs = sum(legacy_regex_tagging(q)[0] != tag_entities(q)[0] for q in questions[:10000])
+    print(f"태깅 결과가 다른 질문 (앞 10,000건 중): {differs:,}")
+    return {"legacy_s": legacy, "compiled_s": compiled}
+
+
+def benchmark_rewrite(questions):
+    n = len(questions)
+    tagged = []
+    for question in questions:
+        tags = tag_entities(question)[1]
+        tags += [{"type": "LOT_ID", "value": value} for value in LOT_RE.findall(question)]
+        tagged.append((question, tags))
+
+    start = time.perf_counter()
+    for question, tags in tagged:
+        legacy_rewrite_question(question, tags)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for question, tags in tagged:
+        rewrite(question, tags)
+    spans = time.perf_counter() - start
+    print(f"[{n:,}건 재작성] legacy: {legacy:.2f}s ({n / legacy:,.0f} q/s)")
+    print(f"[{n:,}건 재작성] span: {spans:.2f}s ({n / spans:,.0f} q/s) x{legacy / spans:.1f}")
+    return {"legacy_s": legacy, "span_s": spans}
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    if len(sys.argv) > 1 and sys.argv[1] != "-":
+        with open(sys.argv[1], encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()][:count]
+    else:
+        questions = synthetic_questions(count)
+    benchmark(questions)
+    benchmark_rewrite(questions)
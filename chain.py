@@ -4,8 +4,16 @@ from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from operator import itemgetter
-import os, requests, json
+import os, requests, json, time, asyncio
 from dotenv import load_dotenv
+from opensearch_client import get_client
+from semantic_cache import SemanticCache
+from model_registry import get_model
+from query_classifier import classify_locally
+from local_vector_store import LocalVectorStore
+from context_packer import pack_context
+from coalescing import SingleFlight, normalize_query
+from question_tagging import id_signature
 
 # OPENSEARCJ
 host = 'com'
@@ -15,9 +23,9 @@ index_name = '모델 번호'
 top_n = 3
 embedding_model_id = "TOKEN"
 
-def retriever(query, embedding_model_id, top_n):
-    url = f"https://{host}/{index_name}/_search"
-    search = {
+def build_neural_query(query, embedding_model_id, top_n):
+    return {
+        "size": top_n,
         "_source": {
             "excludes": ["passage_chunk_embedding"]
         },
@@ -37,6 +45,83 @@ def retriever(query, embedding_model_id, top_n):
         }
     }
 
+def build_bm25_query(query, top_n):
+    return {
+        "size": top_n,
+        "_source": {
+            "excludes": ["passage_chunk_embedding"]
+        },
+        "query": {
+            "match": {
+                "text": {"query": query}
+            }
+        }
+    }
+
+# 검색 방식: "neural" (kNN 만) / "hybrid" (BM25 + kNN 을 _msearch 로 동시에 실행 후 결합)
+RETRIEVAL_MODE = "neural"
+FUSION_METHOD = "rrf"          # "rrf" 또는 "weighted"
+RRF_K = 60
+FUSION_WEIGHTS = (1.0, 1.0)    # (bm25, neural)
+HYBRID_CANDIDATES = 20         # 결합 전 각 검색에서 가져올 후보 수
+
+def fuse_results(result_lists, top_n, method=None, k=None, weights=None):
+    """여러 검색 결과(hits 리스트)를 RRF 또는 min-max 정규화 가중합으로 합쳐 상위 top_n 을 반환합니다."""
+    method = method or FUSION_METHOD
+    k = RRF_K if k is None else k
+    weights = weights or FUSION_WEIGHTS
+    scores = {}
+    docs = {}
+    for hits, weight in zip(result_lists, weights):
+        if not hits:
+            continue
+        if method == "weighted":
+            raw = [hit["_score"] or 0.0 for hit in hits]
+            low, high = min(raw), max(raw)
+            span = (high - low) or 1.0
+        for rank, hit in enumerate(hits):
+            if method == "weighted":
+                contribution = weight * ((hit["_score"] or 0.0) - low) / span
+            else:
+                contribution = weight / (k + rank + 1)
+            scores[hit["_id"]] = scores.get(hit["_id"], 0.0) + contribution
+            docs.setdefault(hit["_id"], hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_n]
+    return [{**docs[doc_id], "_score": scores[doc_id]} for doc_id in ranked]
+
+def _hybrid_bodies(query, embedding_model_id, top_n):
+    candidates = max(top_n, HYBRID_CANDIDATES)
+    return [build_bm25_query(query, candidates), build_neural_query(query, embedding_model_id, candidates)]
+
+# 커넥션 풀을 공유하는 검색 클라이언트 (요청마다 TLS 핸드셰이크 반복 방지)
+opensearch = get_client(host, auth)
+
+# LOCAL_VECTOR_STORE(.npy 경로)를 지정하면 OpenSearch 대신 로컬 벡터 스토어로 검색 (오프라인 테스트용)
+# 질의 임베딩 모델은 LOCAL_EMBEDDING_MODEL (인덱스를 만든 모델과 같은 HF 모델)
+local_store = None
+if os.getenv("LOCAL_VECTOR_STORE"):
+    local_store = LocalVectorStore.load(os.getenv("LOCAL_VECTOR_STORE"), model_name=os.getenv("LOCAL_EMBEDDING_MODEL"))
+
+def retriever(query, embedding_model_id, top_n, mode=None):
+    if local_store is not None:
+        return local_store.retriever(query, embedding_model_id, top_n)
+    if (mode or RETRIEVAL_MODE) == "hybrid":
+        responses = opensearch.msearch(index_name, _hybrid_bodies(query, embedding_model_id, top_n))
+        return fuse_results([r["hits"]["hits"] for r in responses], top_n)
+    search = build_neural_query(query, embedding_model_id, top_n)
+    response = opensearch.search(index_name, search)
+    return response["hits"]["hits"]
+
+async def aretriever(query, embedding_model_id, top_n, mode=None):
+    if local_store is not None:
+        return local_store.retriever(query, embedding_model_id, top_n)
+    if (mode or RETRIEVAL_MODE) == "hybrid":
+        responses = await opensearch.amsearch(index_name, _hybrid_bodies(query, embedding_model_id, top_n))
+        return fuse_results([r["hits"]["hits"] for r in responses], top_n)
+    search = build_neural_query(query, embedding_model_id, top_n)
+    response = await opensearch.asearch(index_name, search)
+    return response["hits"]["hits"]
+
 llm = ChatOpenAI(
     model="",
     openai_api_key="",
@@ -59,13 +144,36 @@ classification_chain = (
     | StrOutputParser()
 )
 
-def classification_route(info):
-    query = info["query"]
-    # question인 경우
-    if "question" in info["topic"].lower():
-        # summarize
-        summarize_prompt = PromptTemplate.from_template(
-            """You are an assistant trained to summarize given user query.
+# 로컬 분류기로 확실한 질의는 바로 분류하고, 애매한 경우만 classification_chain(LLM) 호출
+LOCAL_CLASSIFIER_MIN_CONFIDENCE = 0.9  # 패턴 2개 이상 (0.6 + 0.15 * 2)
+classification_stats = {"local": 0, "llm": 0}
+
+def _local_topic(inputs):
+    label, confidence = classify_locally(inputs["query"])
+    if label is not None and confidence >= LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+        classification_stats["local"] += 1
+        return label
+    classification_stats["llm"] += 1
+    return None
+
+def classify_query(inputs):
+    return _local_topic(inputs) or classification_chain.invoke(inputs)
+
+async def aclassify_query(inputs):
+    return _local_topic(inputs) or await classification_chain.ainvoke(inputs)
+
+topic_chain = RunnableLambda(classify_query, afunc=aclassify_query)
+
+def llm_avoidance_rate():
+    total = classification_stats["local"] + classification_stats["llm"]
+    return classification_stats["local"] / total if total else 0.0
+
+# ------------------------------------------
+# 라우트별 체인 (import 시 한 번만 구성, 요청 데이터는 입력으로 전달)
+# ------------------------------------------
+# question: summarize
+summarize_prompt = PromptTemplate.from_template(
+    """You are an assistant trained to summarize given user query.
 User query is a kind of question. Your mission is to clarify the question so that it is easier to understand and answer.
 Don't answer, just summarize the question.
 Summarize the question in a clear and concise manner.
@@ -75,26 +183,36 @@ Answer in KOREAN.
 
 Query : "{query}"
 """
-        )
-        summarize_chain = (
-            summarize_prompt
-            | llm
-            | StrOutputParser()
-        )
-        question = summarize_chain.invoke({"query": query})
-
-        # answer
-        retrieved_data = [
-            {
-                'retrieved_title': doc['_id'],
-                'retrieved_answer': doc['_source']['text'],
-                'score': doc['_score'],
-                'url': doc['_source']['url']
-            }
-            for doc in retriever(question, embedding_model_id, top_n)
-        ]
+)
+
+summarize_chain = (
+    summarize_prompt
+    | llm
+    | StrOutputParser()
+)
+
+# question: retrieve
+def to_retrieved_data(docs):
+    return [
+        {
+            'retrieved_title': doc['_id'],
+            'retrieved_answer': doc['_source']['text'],
+            'score': doc['_score'],
+            'url': doc['_source']['url']
+        }
+        for doc in docs
+    ]
+
+def retrieve_documents(question):
+    return to_retrieved_data(retriever(question, embedding_model_id, top_n))
+
+async def aretrieve_documents(question):
+    return to_retrieved_data(await aretriever(question, embedding_model_id, top_n))
 
-        answer_prompt = """
+retrieve_chain = RunnableLambda(retrieve_documents, afunc=aretrieve_documents)
+
+# question: answer
+answer_prompt = """
 You are an assistant for question-answering tasks.
 Before the answer, explain what was the question.
 examples
@@ -103,48 +221,230 @@ PROMPT
 Question: "{question}"
 Retrieved_data: "{retrieved_data}"
 """
-        prompt_template = PromptTemplate(
-            template=answer_prompt,
-            input_variables=["question", "retrieved_data"]
-        )
+answer_prompt_template = PromptTemplate(
+    template=answer_prompt,
+    input_variables=["question", "retrieved_data"]
+)
 
-        def render_prompt(inputs):
-            return prompt_template.format(**inputs)
+# retrieved_data 를 토큰 예산 안의 짧은 형식으로 패킹해서 프롬프트에 넣음
+CONTEXT_TOKEN_BUDGET = 1500
+context_stats = {"requests": 0, "tokens_before": 0, "tokens_after": 0, "last_tokens_saved": 0}
 
-        question_chain = (
-            {"question": lambda x: question, "retrieved_data": lambda x: retrieved_data}
-            | RunnableLambda(render_prompt)
-            | llm
-        )
+def pack_answer_inputs(inputs):
+    packed, stats = pack_context(inputs["retrieved_data"], budget_tokens=CONTEXT_TOKEN_BUDGET)
+    context_stats["requests"] += 1
+    context_stats["tokens_before"] += stats["tokens_before"]
+    context_stats["tokens_after"] += stats["tokens_after"]
+    context_stats["last_tokens_saved"] = stats["tokens_saved"]
+    return {"question": inputs["question"], "retrieved_data": packed}
 
-        return question_chain
+def average_tokens_saved():
+    if not context_stats["requests"]:
+        return 0.0
+    return (context_stats["tokens_before"] - context_stats["tokens_after"]) / context_stats["requests"]
 
-    # request인 경우
-    elif "request" in info["topic"].lower():
-        request_chain = (
-            PromptTemplate.from_template(
-                """You are designed to answer only questions.
+# 입력: {"question", "retrieved_data"}
+question_chain = (
+    RunnableLambda(pack_answer_inputs)
+    | answer_prompt_template
+    | llm
+    | StrOutputParser()
+)
+
+answer_stage = {"answer": question_chain, "retrieved_data": itemgetter("retrieved_data")}
+
+question_route_chain = (
+    RunnablePassthrough.assign(question=summarize_chain)
+    | RunnablePassthrough.assign(retrieved_data=itemgetter("question") | retrieve_chain)
+    | answer_stage
+)
+
+def no_documents(_):
+    return []
+
+# request인 경우
+request_chain = (
+    PromptTemplate.from_template(
+        """You are designed to answer only questions.
 Answer "죄송합니다. 저는 질문에만 답변할 수 있습니다."
 """
-            )
-            | llm
-        )
-        return request_chain
+    )
+    | llm
+    | StrOutputParser()
+)
+request_route_chain = RunnableParallel(answer=request_chain, retrieved_data=no_documents)
 
-    # 그 외의 경우
-    else:
-        other_chain = (
-            PromptTemplate.from_template(
-                """You are designed to answer only questions.
+# 그 외의 경우
+other_chain = (
+    PromptTemplate.from_template(
+        """You are designed to answer only questions.
 Answer "죄송합니다. 저는 질문에만 답변할 수 없습니다. 질문이 올바른지 확인 부탁드립니다."
 """
-            )
-            | llm
-        )
-        return other_chain
+    )
+    | llm
+    | StrOutputParser()
+)
+other_route_chain = RunnableParallel(answer=other_chain, retrieved_data=no_documents)
+
+def classification_route(info):
+    topic = info["topic"].lower()
+    # question인 경우
+    if "question" in topic:
+        return question_route_chain
+    # request인 경우
+    elif "request" in topic:
+        return request_route_chain
+    # 그 외의 경우
+    else:
+        return other_route_chain
 
-full_chain = (
-    {"topic": classification_chain, "query": itemgetter("query")}
+# 답변과 함께 검색 결과(retrieved_data)도 반환
+full_chain_with_sources = (
+    {"topic": topic_chain, "query": itemgetter("query")}
     | RunnableLambda(classification_route)
-    | StrOutputParser()
 )
+
+full_chain = full_chain_with_sources | itemgetter("answer")
+
+# ------------------------------------------
+# 토큰 스트리밍
+# ------------------------------------------
+async def astream_full_chain(query):
+    """단계별 진행 이벤트(progress)와 최종 답변 토큰(token)을 도착하는 대로 yield 합니다."""
+    start = time.perf_counter()
+
+    def event(event_type, **fields):
+        return {"type": event_type, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1), **fields}
+
+    inputs = {"query": query}
+    topic = await topic_chain.ainvoke(inputs)
+    yield event("progress", stage="classified", topic=topic)
+
+    retrieved_data = []
+    if "question" in topic.lower():
+        question = await summarize_chain.ainvoke(inputs)
+        yield event("progress", stage="summarized", question=question)
+        retrieved_data = await retrieve_chain.ainvoke(question)
+        yield event("progress", stage="retrieved", retrieved_data=retrieved_data)
+        answer_chain, answer_inputs = question_chain, {"question": question, "retrieved_data": retrieved_data}
+    elif "request" in topic.lower():
+        answer_chain, answer_inputs = request_chain, inputs
+    else:
+        answer_chain, answer_inputs = other_chain, inputs
+
+    tokens = []
+    async for token in answer_chain.astream(answer_inputs):
+        tokens.append(token)
+        yield event("token", content=token)
+    yield event("done", answer="".join(tokens), retrieved_data=retrieved_data)
+
+# ------------------------------------------
+# 배치 API (중복 제거 + 실행 중 요청 병합)
+# ------------------------------------------
+# 같은(정규화 후 같은) 질의는 한 번만 실행하고, 다른 요청이 이미 실행 중인 질의는 그 결과를 공유
+single_flight = SingleFlight()
+batch_stats = {"requested": 0, "unique": 0}
+
+async def acoalesced_full_chain(query, runnable=None, semaphore=None):
+    runnable = runnable or full_chain
+
+    async def run():
+        if semaphore is None:
+            return await runnable.ainvoke({"query": query})
+        async with semaphore:
+            return await runnable.ainvoke({"query": query})
+
+    return await single_flight.do((id(runnable), normalize_query(query)), run)
+
+async def abatch_full_chain(queries, max_concurrency=8, runnable=None):
+    """queries 순서대로 결과를 반환합니다. 중복 질의는 한 번만 실행됩니다."""
+    unique = {}
+    for query in queries:
+        unique.setdefault(normalize_query(query), query)
+    batch_stats["requested"] += len(queries)
+    batch_stats["unique"] += len(unique)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = await asyncio.gather(
+        *(acoalesced_full_chain(query, runnable, semaphore) for query in unique.values())
+    )
+    by_key = dict(zip(unique.keys(), results))
+    return [by_key[normalize_query(query)] for query in queries]
+
+def batch_full_chain(queries, max_concurrency=8, runnable=None):
+    return asyncio.run(abatch_full_chain(queries, max_concurrency, runnable))
+
+# ------------------------------------------
+# 추측 검색 모드 (opt-in)
+# ------------------------------------------
+# 분류 / 요약 / 원문 질의 검색을 동시에 시작하고, 요약된 질문이 원문과 충분히 비슷하면
+# 원문으로 검색한 결과를 그대로 사용 (아니면 버리고 요약 질문으로 다시 검색)
+SPECULATIVE_MIN_SIMILARITY = 0.5
+speculation_stats = {"used": 0, "discarded": 0, "not_question": 0}
+
+def _bigrams(text):
+    text = "".join(text.split()).casefold()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def question_similarity(a, b):
+    # 문자 bigram Dice 계수 (모델 호출 없이 수 us)
+    a, b = _bigrams(a), _bigrams(b)
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+speculative_stage = RunnableParallel(
+    topic=topic_chain,
+    query=itemgetter("query"),
+    question=summarize_chain,
+    speculative_data=itemgetter("query") | retrieve_chain,
+)
+
+speculative_hit_chain = RunnablePassthrough.assign(retrieved_data=itemgetter("speculative_data")) | answer_stage
+speculative_miss_chain = (
+    RunnablePassthrough.assign(retrieved_data=itemgetter("question") | retrieve_chain)
+    | answer_stage
+)
+
+def speculative_route(info):
+    if "question" not in info["topic"].lower():
+        speculation_stats["not_question"] += 1
+        return classification_route(info)
+    if question_similarity(info["question"], info["query"]) >= SPECULATIVE_MIN_SIMILARITY:
+        speculation_stats["used"] += 1
+        return speculative_hit_chain
+    speculation_stats["discarded"] += 1
+    return speculative_miss_chain
+
+speculative_full_chain_with_sources = speculative_stage | RunnableLambda(speculative_route)
+speculative_full_chain = speculative_full_chain_with_sources | itemgetter("answer")
+
+# 시맨틱 캐시 (opt-in): 비슷한 질문이면 LLM/검색 없이 저장된 answer, retrieved_data 반환
+SEMANTIC_CACHE_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# 랏/설비/기안 ID 는 임베딩으로 구분되지 않으므로 ID 가 정확히 같은 질문끼리만 재사용
+semantic_cache = SemanticCache(
+    lambda text: get_model(SEMANTIC_CACHE_MODEL).encode(text),
+    threshold=0.92,
+    ttl_seconds=3600,
+    max_entries=1000,
+    key_fn=id_signature,
+)
+
+def cached_answer(inputs):
+    cached = semantic_cache.lookup(inputs["query"])
+    if cached is not None:
+        return cached
+    result = full_chain_with_sources.invoke(inputs)
+    semantic_cache.store(inputs["query"], result)
+    return result
+
+async def acached_answer(inputs):
+    # 임베딩 계산(encode)이 이벤트 루프를 막지 않도록 스레드에서 실행
+    cached = await asyncio.to_thread(semantic_cache.lookup, inputs["query"])
+    if cached is not None:
+        return cached
+    result = await full_chain_with_sources.ainvoke(inputs)
+    await asyncio.to_thread(semantic_cache.store, inputs["query"], result)
+    return result
+
+cached_full_chain = RunnableLambda(cached_answer, afunc=acached_answer)
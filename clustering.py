@@ -0,0 +1,198 @@
+import json
+import os
+
+import numpy as np
+
+from similarity import iter_similar_pairs
+
+# ==========================================
+# 증분(온라인) 클러스터링
+# ==========================================
+# - 새 벡터는 기존 클러스터 중심(centroid)과만 비교해 가장 가까운 곳에 배정 (O(K), N 과 무관)
+# - 임계값 밖이면 새 클러스터 생성
+# - merge_every 개가 추가될 때마다 가까워진 중심끼리 병합 (작은 ID 유지)
+# - 상태(중심, 멤버별 클러스터 ID)를 .npz 로 저장해 다음 실행에서 ID 가 유지됨
+#   key 목록은 고정폭 유니코드 배열 대신 옆의 .keys.json 에 저장 (긴 key 가 있어도 파일이 커지지 않음)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IncrementalClusterer:
+    def __init__(self, distance_threshold=0.25, merge_every=1000):
+        # AgglomerativeClustering 의 distance_threshold(1 - cosine) 와 같은 의미
+        self.distance_threshold = distance_threshold
+        self.merge_every = merge_every
+        self.sums = None                                 # 클러스터별 정규화 벡터 합
+        self.counts = np.empty(0, dtype=np.int64)
+        self.cluster_ids = np.empty(0, dtype=np.int64)
+        self.size = 0                                    # 사용 중인 클러스터 수
+        self.next_id = 0
+        self.assignments = {}                            # key -> cluster id
+        self._added_since_merge = 0
+
+    @property
+    def similarity_threshold(self):
+        return 1 - self.distance_threshold
+
+    # ------------------------------------------
+    # 배정
+    # ------------------------------------------
+    def _centroids(self):
+        return _normalize(self.sums[:self.size])
+
+    def _grow(self, dim):
+        capacity = max(16, 2 * len(self.counts))
+        sums = np.zeros((capacity, dim), dtype=np.float32)
+        counts = np.zeros(capacity, dtype=np.int64)
+        ids = np.zeros(capacity, dtype=np.int64)
+        if self.sums is not None:
+            sums[:self.size] = self.sums[:self.size]
+            counts[:self.size] = self.counts[:self.size]
+            ids[:self.size] = self.cluster_ids[:self.size]
+        self.sums, self.counts, self.cluster_ids = sums, counts, ids
+
+    def partial_fit(self, keys, vectors):
+        """새 key 만 배정하고, 입력 순서대로 클러스터 ID 리스트를 반환합니다."""
+        vectors = _normalize(vectors)
+        centroids = self._centroids() if self.size else None
+
+        for key, vector in zip(keys, vectors):
+            if key in self.assignments:
+                continue
+            best = -1
+            if self.size:
+                sims = centroids @ vector
+                best = int(np.argmax(sims))
+                if sims[best] < self.similarity_threshold:
+                    best = -1
+
+            if best < 0:
+                if self.sums is None or self.size == len(self.counts):
+                    self._grow(vectors.shape[1])
+                best = self.size
+                self.cluster_ids[best] = self.next_id
+                self.next_id += 1
+                self.size += 1
+                centroids = None
+
+            self.sums[best] += vector
+            self.counts[best] += 1
+            if centroids is not None:
+                centroids[best] = _normalize(self.sums[best:best + 1])[0]
+            else:
+                centroids = self._centroids()
+            self.assignments[key] = int(self.cluster_ids[best])
+            self._added_since_merge += 1
+
+            if self._added_since_merge >= self.merge_every:
+                self.merge()
+                centroids = self._centroids()
+
+        return self.labels(keys)
+
+    def labels(self, keys):
+        return [self.assignments.get(key, -1) for key in keys]
+
+    # ------------------------------------------
+    # 병합
+    # ------------------------------------------
+    def merge(self):
+        """중심끼리 임계값 이내로 가까워진 클러스터를 병합합니다. 병합된 수를 반환합니다."""
+        self._added_since_merge = 0
+        if self.size < 2:
+            return 0
+
+        parent = list(range(self.size))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j, _ in iter_similar_pairs(self._centroids(), threshold=self.similarity_threshold):
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                # 더 작은(오래된) ID 를 가진 쪽을 대표로 유지
+                if self.cluster_ids[ri] <= self.cluster_ids[rj]:
+                    parent[rj] = ri
+                else:
+                    parent[ri] = rj
+
+        roots = [find(i) for i in range(self.size)]
+        keep = sorted(set(roots))
+        if len(keep) == self.size:
+            return 0
+
+        id_map = {int(self.cluster_ids[i]): int(self.cluster_ids[root]) for i, root in enumerate(roots)}
+        position = {root: n for n, root in enumerate(keep)}
+        sums = np.zeros_like(self.sums)
+        counts = np.zeros_like(self.counts)
+        ids = np.zeros_like(self.cluster_ids)
+        for i, root in enumerate(roots):
+            sums[position[root]] += self.sums[i]
+            counts[position[root]] += self.counts[i]
+            ids[position[root]] = self.cluster_ids[root]
+
+        merged = self.size - len(keep)
+        self.sums, self.counts, self.cluster_ids = sums, counts, ids
+        self.size = len(keep)
+        self.assignments = {key: id_map[cid] for key, cid in self.assignments.items()}
+        return merged
+
+    def clusters(self):
+        """{cluster id: [key, ...]} 형태로 반환합니다."""
+        grouped = {}
+        for key, cid in self.assignments.items():
+            grouped.setdefault(cid, []).append(key)
+        return grouped
+
+    # ------------------------------------------
+    # 저장 / 불러오기
+    # ------------------------------------------
+    @staticmethod
+    def _keys_path(path):
+        base = path[:-len(".npz")] if path.endswith(".npz") else path
+        return base + ".keys.json"
+
+    def save(self, path):
+        keys = list(self.assignments.keys())
+        np.savez(
+            path,
+            sums=self.sums[:self.size] if self.size else np.empty((0, 0), dtype=np.float32),
+            counts=self.counts[:self.size],
+            cluster_ids=self.cluster_ids[:self.size],
+            labels=np.array([self.assignments[k] for k in keys], dtype=np.int64),
+            next_id=np.int64(self.next_id),
+            distance_threshold=np.float64(self.distance_threshold),
+        )
+        with open(self._keys_path(path), "w", encoding="utf-8") as f:
+            json.dump(keys, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, distance_threshold=0.25, merge_every=1000):
+        """저장된 상태가 있으면 불러오고, 없으면 새로 만듭니다. 저장된 distance_threshold 와 다르면 ValueError."""
+        clusterer = cls(distance_threshold=distance_threshold, merge_every=merge_every)
+        if not os.path.exists(path):
+            return clusterer
+
+        state = np.load(path)
+        saved_threshold = float(state["distance_threshold"])
+        if not np.isclose(saved_threshold, distance_threshold):
+            # 다른 임계값으로 만든 클러스터에 이어 붙이면 병합 기준이 섞임
+            raise ValueError(f"저장된 distance_threshold({saved_threshold})와 인자({distance_threshold})가 다릅니다.")
+        clusterer.next_id = int(state["next_id"])
+        clusterer.size = len(state["counts"])
+        if clusterer.size:
+            clusterer.sums = state["sums"].astype(np.float32)
+            clusterer.counts = state["counts"].astype(np.int64)
+            clusterer.cluster_ids = state["cluster_ids"].astype(np.int64)
+        with open(cls._keys_path(path), encoding="utf-8") as f:
+            keys = json.load(f)
+        clusterer.assignments = {key: int(v) for key, v in zip(keys, state["labels"])}
+        return clusterer
@@ -0,0 +1,39 @@
+import asyncio
+import re
+import unicodedata
+
+# ==========================================
+# 요청 병합 (single-flight)
+# ==========================================
+# 같은 키로 이미 실행 중인 작업이 있으면 새로 실행하지 않고 그 결과를 같이 기다립니다.
+
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([?.!,])")
+
+
+def normalize_query(query):
+    """유니코드(NFKC)/대소문자/공백 차이를 없앤 비교용 키를 만듭니다."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = " ".join(text.split())
+    return _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, coroutine_fn):
+        task = self._inflight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(coroutine_fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # 기다리던 호출자 하나가 취소돼도 공유 작업은 계속 진행
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
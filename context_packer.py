@@ -0,0 +1,113 @@
+import re
+
+# ==========================================
+# 검색 결과 → 프롬프트 컨텍스트 패킹
+# ==========================================
+# - 점수 높은 순으로 토큰 예산(budget_tokens) 안에서만 채움
+# - 예산을 넘는 문서는 문장 경계에서 잘라내고, 문장 하나가 예산보다 길면 남은 토큰만큼 자름
+# - 같은 본문이나 서로 포함 관계인 본문은 점수가 높은 쪽 하나만 넣음
+# - 파이썬 repr 대신 "[번호] 제목 | url" + 본문의 짧은 형식 사용
+# 토크나이저는 tiktoken 이 있으면 사용하고, 없으면 정규식 기반 근사치 사용
+
+# 한글은 글자 단위, 영문은 4글자, 숫자는 3자리(cl100k 와 같은 방식)마다 1개, 기호는 1개씩으로 근사
+# (공백 없는 긴 영문/숫자 덩어리가 1토큰으로 세어지지 않도록 길이를 제한)
+_APPROX_TOKEN_RE = re.compile(r"[가-힣]|[A-Za-z]{1,4}|\d{1,3}|[^\sA-Za-z\d가-힣]")
+_encoding = None
+
+
+def _get_encoding():
+    # tiktoken 인코딩 파일을 받을 수 없는 사내망에서도 동작하도록 실패하면 근사치로 대체
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return len(_APPROX_TOKEN_RE.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """앞에서부터 max_tokens 토큰까지만 남깁니다."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    for count, match in enumerate(_APPROX_TOKEN_RE.finditer(text), 1):
+        if count == max_tokens:
+            return text[:match.end()]
+    return text
+
+
+_SENTENCE_RE = re.compile(r"[^.!?。\n]+(?:[.!?。]+|\n+|$)")
+
+
+def _normalize(text):
+    return " ".join(text.split()).casefold()
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_RE.findall(text) if s.strip()]
+
+
+def pack_context(retrieved_data, budget_tokens=1500):
+    """(packed_text, stats) 를 반환합니다. stats 에는 패킹 전/후 토큰 수와 절약량이 들어 있습니다."""
+    selected = []
+    seen = []
+    used = 0
+
+    for doc in sorted(retrieved_data, key=lambda d: d.get("score") or 0.0, reverse=True):
+        text = doc.get("retrieved_answer") or ""
+        normalized = _normalize(text)
+        # 점수 순으로 돌기 때문에 이미 넣은 본문이 항상 점수가 높음 → 어느 쪽이 포함하든 뒤의 것을 버림
+        if not normalized or any(normalized in other or other in normalized for other in seen):
+            continue
+
+        header = f"[{len(selected) + 1}] {doc.get('retrieved_title')}"
+        if doc.get("url"):
+            header += f" | {doc['url']}"
+        header_tokens = count_tokens(header) + 1
+        if used + header_tokens >= budget_tokens:
+            continue
+
+        sentences = []
+        body_tokens = 0
+        for sentence in split_sentences(text):
+            tokens = count_tokens(sentence) + 1
+            if used + header_tokens + body_tokens + tokens > budget_tokens:
+                # 문장부호 없는 표/슬라이드 청크처럼 긴 문장은 남은 예산만큼 잘라서 넣음
+                remaining = budget_tokens - used - header_tokens - body_tokens - 1
+                partial = truncate_to_tokens(sentence, remaining).strip()
+                if partial:
+                    sentences.append(partial)
+                    body_tokens += count_tokens(partial) + 1
+                break
+            sentences.append(sentence)
+            body_tokens += tokens
+        if not sentences:
+            continue
+
+        seen.append(normalized)
+        selected.append(header + "\n" + " ".join(sentences))
+        used += header_tokens + body_tokens
+
+    packed = "\n\n".join(selected)
+    before = count_tokens(str(retrieved_data))
+    after = count_tokens(packed)
+    return packed, {
+        "documents_in": len(retrieved_data),
+        "documents_packed": len(selected),
+        "tokens_before": before,
+        "tokens_after": after,
+        "tokens_saved": before - after,
+    }
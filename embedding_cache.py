@@ -0,0 +1,114 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# ==========================================
+# 디스크 임베딩 캐시 (SQLite)
+# ==========================================
+# 키: (모델 이름, 텍스트 sha256) / 값: float32 벡터
+# max_entries 를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (LRU)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path="embedding_cache.sqlite", max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+    def get_many(self, model_name, hashes):
+        """{hash: vector} 로 캐시에 있는 것만 반환하고 접근 시각을 갱신합니다."""
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model_name, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model_name, items):
+        """items: {hash: vector}"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                [(model_name, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def encode(self, model, model_name, texts, batch_size=64):
+        """캐시에 없는 텍스트만 한 번의 배치 호출로 인코딩해 (len(texts), dim) 배열을 반환합니다."""
+        hashes = [text_hash(text) for text in texts]
+        cached = self.get_many(model_name, set(hashes))
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = text
+        miss_count = sum(1 for h in hashes if h in missing)
+        self.misses += miss_count
+        self.hits += len(hashes) - miss_count
+
+        if missing:
+            vectors = model.encode(list(missing.values()), batch_size=batch_size, convert_to_numpy=True)
+            encoded = {h: np.asarray(v, dtype=np.float32) for h, v in zip(missing, vectors)}
+            self.put_many(model_name, encoded)
+            cached.update(encoded)
+
+        return np.stack([cached[h] for h in hashes]) if hashes else np.empty((0, 0), dtype=np.float32)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self):
+        self._conn.close()
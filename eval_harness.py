@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+# ==========================================
+# LLM 평가 하네스
+# ==========================================
+# - asyncio.Semaphore 로 동시 호출 수 제한
+# - 초당 요청 수 제한 (RateLimiter)
+# - 실패 시 지수 백오프 + jitter 로 재시도
+# - 결과를 JSONL 로 한 줄씩 기록하고, 다시 실행하면 성공한 id 는 건너뜀 (resume)
+# chain 은 ainvoke 를 가진 Runnable 이면 무엇이든 됨 (테스트 시 FakeListChatModel 사용 가능)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def invoke_with_retry(chain, inputs, limiter=None, max_retries=3, base_delay=1.0, max_delay=30.0, timeout=120.0):
+    """chain.ainvoke 를 재시도(지수 백오프 + jitter)와 함께 호출합니다."""
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            return await asyncio.wait_for(chain.ainvoke(inputs), timeout)
+        except Exception:
+            if attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def load_checkpoint(path, id_key="id"):
+    """체크포인트 JSONL 에서 성공(status == "ok")한 결과만 {id: record} 로 읽어옵니다."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 중단 시 잘린 마지막 줄
+            if record.get("status") == "ok":
+                done[str(record[id_key])] = record
+            else:
+                done.pop(str(record[id_key]), None)
+    return done
+
+
+async def arun_dataset(records, task, checkpoint_path, id_key="id", max_concurrency=16,
+                       requests_per_second=None, max_retries=3, base_delay=1.0, timeout=120.0):
+    """records 각각에 task(record, invoke) 를 제한된 동시성으로 실행하고 결과를 record 순서대로 반환합니다.
+    task 안에서는 invoke(chain, inputs) 로 LLM 을 호출합니다 (재시도/속도 제한 적용)."""
+    done = load_checkpoint(checkpoint_path, id_key)
+    limiter = RateLimiter(requests_per_second) if requests_per_second else None
+    semaphore = asyncio.Semaphore(max_concurrency)
+    write_lock = asyncio.Lock()
+
+    async def invoke(chain, inputs):
+        return await invoke_with_retry(chain, inputs, limiter, max_retries, base_delay, timeout=timeout)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as out:
+        async def run_one(record):
+            record_id = str(record[id_key])
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = {**(await task(record, invoke)), "status": "ok"}
+                except Exception as e:
+                    result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            result = {id_key: record_id, **result, "elapsed_sec": round(time.perf_counter() - start, 3)}
+            async with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+            return result
+
+        pending = [record for record in records if str(record[id_key]) not in done]
+        new_results = await asyncio.gather(*(run_one(record) for record in pending))
+
+    results = dict(done)
+    results.update({str(result[id_key]): result for result in new_results})
+    return [results[str(record[id_key])] for record in records]
+
+
+# ------------------------------------------
+# metric.py 체인용 태스크
+# ------------------------------------------
+def _parse_score(output):
+    try:
+        parsed = json.loads(output)
+        return {"score": parsed.get("score"), "reason": parsed.get("reason")}
+    except (json.JSONDecodeError, AttributeError):
+        return {"score": None, "reason": None}
+
+
+def evaluation_task(chain):
+    # record: {"id", "question", "answer"}
+    async def task(record, invoke):
+        output = await invoke(chain, {"question": record["question"], "answer": record["answer"]})
+        return {"raw": output, **_parse_score(output)}
+    return task
+
+
+def robustness_task(chain, answer_fn):
+    # record: {"id", "question"} / answer_fn: 질문을 받아 답변을 돌려주는 async 함수
+    async def task(record, invoke):
+        paraphrased_question = await invoke(chain, {"question": record["question"]})
+        paraphrased_answer = await answer_fn(paraphrased_question)
+        return {
+            "paraphrased_question": paraphrased_question,
+            "paraphrased_answer": paraphrased_answer
+        }
+    return task
+
+
+def run_evaluation(records, checkpoint_path, chain=None, **kwargs):
+    """evaluation_chain 으로 (question, answer) 데이터셋을 평가합니다."""
+    if chain is None:
+        from metric import get_evaluation_chain
+        chain = get_evaluation_chain()
+    return asyncio.run(arun_dataset(records, evaluation_task(chain), checkpoint_path, **kwargs))
+
+
+def run_robustness(records, checkpoint_path, answer_fn, chain=None, **kwargs):
+    """paraphrase_chain 으로 질문을 바꿔 answer_fn 의 답변을 수집합니다."""
+    if chain is None:
+        from metric import get_paraphrase_chain
+        chain = get_paraphrase_chain()
+    return asyncio.run(arun_dataset(records, robustness_task(chain, answer_fn), checkpoint_path, **kwargs))
+
+
+if __name__ == "__main__":
+    # 로컬 가짜 LLM 으로 하네스 동작 확인
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    fake_llm = FakeListChatModel(responses=['{"score": 4, "reason": "ok"}'])
+    fake_chain = PromptTemplate.from_template("{question} {answer}") | fake_llm | StrOutputParser()
+    dataset = [{"id": i, "question": f"질문 {i}", "answer": f"답변 {i}"} for i in range(100)]
+    start = time.perf_counter()
+    results = run_evaluation(dataset, "eval_checkpoint.jsonl", chain=fake_chain, max_concurrency=32)
+    print(len(results), results[0], f"{time.perf_counter() - start:.2f}s")
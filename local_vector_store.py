@@ -0,0 +1,140 @@
+import json
+import os
+
+import numpy as np
+
+from model_registry import get_model
+
+# ==========================================
+# 로컬 벡터 스토어 (OpenSearch 대체용, 오프라인 부하 테스트 / CI)
+# ==========================================
+# - ragv2.get_embeddings_from_opensearch(out_path=...) 가 만든 .npy(float32) + .meta.jsonl 을 그대로 사용
+# - 벡터는 np.memmap 으로 열어 필요한 블록만 메모리에 올림
+# - 기본은 블록 단위 정확(exact) top-k, build_ivf() 후에는 IVF(nprobe 개 리스트만 탐색) 근사 검색
+# - retriever(query, model_id, top_n) 는 chain.retriever 와 같은 형태(_id/_score/_source)를 반환
+# 질의 임베딩 모델은 인덱스를 만든 모델과 같아야 함 (OpenSearch 에 올린 것과 같은 HF 모델)
+
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".meta.jsonl"
+
+
+class LocalVectorStore:
+    def __init__(self, vectors, records, model_name=None, block_size=65536):
+        self.vectors = vectors
+        self.records = records
+        self.model_name = model_name
+        self.block_size = block_size
+
+        norms = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), block_size):
+            norms[start:start + block_size] = np.linalg.norm(vectors[start:start + block_size], axis=1)
+        norms[norms == 0] = 1.0
+        self.inv_norms = 1.0 / norms
+
+        self.centroids = None
+        self.list_offsets = None
+        self.list_members = None
+
+    @classmethod
+    def load(cls, path, model_name=None, mmap=True, **kwargs):
+        """path(.npy) 와 옆의 .meta.jsonl 을 불러옵니다."""
+        vectors = np.load(path, mmap_mode="r" if mmap else None)
+        with open(_meta_path(path), encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if len(records) != len(vectors):
+            raise ValueError(f"벡터 수({len(vectors)})와 메타데이터 수({len(records)})가 다릅니다.")
+        store = cls(vectors, records, model_name=model_name, **kwargs)
+        index_path = os.path.splitext(path)[0] + ".ivf.npz"
+        if os.path.exists(index_path):
+            store.load_ivf(index_path)
+        return store
+
+    # ------------------------------------------
+    # 검색
+    # ------------------------------------------
+    def _top_k(self, indices, scores, top_n):
+        if len(scores) > top_n:
+            part = np.argpartition(-scores, top_n - 1)[:top_n]
+            indices, scores = indices[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return indices[order], scores[order]
+
+    def _exact(self, query, top_n):
+        best_idx = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self.vectors), self.block_size):
+            block = np.asarray(self.vectors[start:start + self.block_size], dtype=np.float32)
+            scores = (block @ query) * self.inv_norms[start:start + len(block)]
+            idx, sc = self._top_k(np.arange(start, start + len(block)), scores, top_n)
+            best_idx, best_scores = self._top_k(np.concatenate([best_idx, idx]), np.concatenate([best_scores, sc]), top_n)
+        return best_idx, best_scores
+
+    def _ivf(self, query, top_n, nprobe):
+        lists = np.argsort(-(self.centroids @ query))[:nprobe]
+        candidates = np.concatenate([self.list_members[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+        candidates.sort()  # memmap 을 순서대로 읽도록 정렬
+        scores = (np.asarray(self.vectors[candidates], dtype=np.float32) @ query) * self.inv_norms[candidates]
+        return self._top_k(candidates, scores, top_n)
+
+    def search_vector(self, query_vector, top_n, nprobe=8):
+        """(indices, cosine scores) 를 점수 내림차순으로 반환합니다."""
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        if self.centroids is not None:
+            return self._ivf(query, top_n, nprobe)
+        return self._exact(query, top_n)
+
+    def retriever(self, query, model_id, top_n, nprobe=8):
+        model = get_model(self.model_name or model_id)
+        indices, scores = self.search_vector(model.encode(query), top_n, nprobe=nprobe)
+        return [
+            {
+                "_id": self.records[i]["id"],
+                "_score": float(score),
+                "_source": {k: v for k, v in self.records[i].items() if k != "id"},
+            }
+            for i, score in zip(indices, scores)
+        ]
+
+    # ------------------------------------------
+    # IVF 인덱스
+    # ------------------------------------------
+    def build_ivf(self, n_lists=256, n_iter=10, sample_size=100000, seed=0):
+        """샘플 k-means 로 중심을 만들고 전체 벡터를 가장 가까운 리스트에 배정합니다."""
+        rng = np.random.default_rng(seed)
+        n = len(self.vectors)
+        n_lists = min(n_lists, n)
+        sample = np.sort(rng.choice(n, size=min(sample_size, n), replace=False))
+        data = np.asarray(self.vectors[sample], dtype=np.float32) * self.inv_norms[sample, None]
+
+        centroids = data[rng.choice(len(data), size=n_lists, replace=False)]
+        for _ in range(n_iter):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = data[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, self.block_size):
+            block = np.asarray(self.vectors[start:start + self.block_size], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        self.centroids = centroids
+        self.list_members = np.argsort(assign, kind="stable")
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+
+    def save_ivf(self, path):
+        np.savez(path, centroids=self.centroids, list_members=self.list_members, list_offsets=self.list_offsets)
+
+    def load_ivf(self, path):
+        state = np.load(path)
+        self.centroids = state["centroids"]
+        self.list_members = state["list_members"]
+        self.list_offsets = state["list_offsets"]
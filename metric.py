@@ -1,21 +1,155 @@
+import numpy as np
+import pandas as pd
+
 # 기준 정답이 있다면 정답 chunk 포함 여부 확인
 def evaluate_retrieval(retrieved_docs, ground_truth_chunks):
+    ground_truth = set(ground_truth_chunks)
     retrieved_ids = [doc['_id'] for doc in retrieved_docs]
-    true_positives = [doc_id for doc_id in retrieved_ids if doc_id in ground_truth_chunks]
+    true_positives = [doc_id for doc_id in retrieved_ids if doc_id in ground_truth]
     precision = len(true_positives) / len(retrieved_docs) if retrieved_docs else 0
     recall = len(true_positives) / len(ground_truth_chunks) if ground_truth_chunks else 0
     return {"precision": precision, "recall": recall}
 
-from sentence_transformers import SentenceTransformer, util
+# 여러 쿼리의 검색 결과(run)를 한 번에 평가
+# run  : {query_id: [doc_id, ...] (순위순)} 또는 [{'_id': ...}, ...]
+# qrels: {query_id: [doc_id, ...]} 또는 {query_id: {doc_id: 등급}}
+def load_trec_run(path):
+    # "qid Q0 doc_id rank score tag" 형식, 점수 내림차순으로 정렬
+    df = pd.read_csv(path, sep=r"\s+", header=None, usecols=[0, 2, 4], names=["qid", "doc_id", "score"], dtype={0: str, 2: str})
+    df = df.sort_values(["qid", "score"], ascending=[True, False], kind="stable")
+    return df.groupby("qid", sort=False)["doc_id"].apply(list).to_dict()
+
+def load_trec_qrels(path):
+    # "qid 0 doc_id relevance" 형식, relevance > 0 만 정답으로 사용
+    df = pd.read_csv(path, sep=r"\s+", header=None, usecols=[0, 2, 3], names=["qid", "doc_id", "rel"], dtype={0: str, 2: str})
+    df = df[df["rel"] > 0]
+    return {qid: dict(zip(group["doc_id"], group["rel"])) for qid, group in df.groupby("qid", sort=False)}
+
+def _run_arrays(run, qids):
+    # (쿼리 번호, doc_id, 순위) 를 평탄화한 배열
+    lengths = np.fromiter((len(run[qid]) for qid in qids), dtype=np.int64, count=len(qids))
+    doc_ids = [doc['_id'] if isinstance(doc, dict) else doc for qid in qids for doc in run[qid]]
+    q_codes = np.repeat(np.arange(len(qids)), lengths)
+    ranks = np.arange(len(doc_ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return q_codes, doc_ids, ranks
+
+def _qrels_arrays(qrels, qid_position):
+    q_codes, doc_ids, grades = [], [], []
+    for qid, relevant in qrels.items():
+        position = qid_position.get(qid)
+        if position is None:
+            continue
+        items = relevant.items() if isinstance(relevant, dict) else ((doc_id, 1) for doc_id in relevant)
+        for doc_id, grade in items:
+            if grade > 0:
+                q_codes.append(position)
+                doc_ids.append(doc_id)
+                grades.append(float(grade))
+    return np.array(q_codes, dtype=np.int64), doc_ids, np.array(grades)
+
+def evaluate_run(run, qrels, ks=(1, 3, 5, 10)):
+    """precision@k, recall@k, hit_rate@k, nDCG@k, MRR 을 쿼리별(DataFrame)/전체 평균(dict)으로 반환합니다."""
+    qids = list(run.keys())
+    qid_position = {qid: i for i, qid in enumerate(qids)}
+    n_queries = len(qids)
+    depth = max([len(docs) for docs in run.values()] + list(ks) + [1])
+
+    run_q, run_docs, run_ranks = _run_arrays(run, qids)
+    rel_q, rel_docs, rel_grades = _qrels_arrays(qrels, qid_position)
+
+    # doc_id 를 정수 코드로 바꿔 (쿼리, 문서) 쌍을 하나의 int64 키로 비교
+    doc_codes, uniques = pd.factorize(pd.Index(run_docs + rel_docs, dtype=object))
+    n_docs = max(len(uniques), 1)
+    run_keys = run_q * n_docs + doc_codes[:len(run_docs)]
+    rel_keys = rel_q * n_docs + doc_codes[len(run_docs):]
+
+    # 정답 목록 중복 제거 (같은 문서는 한 번만)
+    rel_keys, first = np.unique(rel_keys, return_index=True)
+    rel_q, rel_grades = rel_q[first], rel_grades[first]
+
+    # 순위별 gain 행렬 (쿼리 x 순위), 같은 문서가 여러 번 나오면 첫 순위만 인정
+    gains = np.zeros((n_queries, depth))
+    if len(rel_keys) and len(run_keys):
+        first_seen = np.zeros(len(run_keys), dtype=bool)
+        first_seen[np.unique(run_keys, return_index=True)[1]] = True
+        position = np.minimum(np.searchsorted(rel_keys, run_keys), len(rel_keys) - 1)
+        matched = (rel_keys[position] == run_keys) & first_seen
+        gains[run_q[matched], run_ranks[matched]] = rel_grades[position[matched]]
+    relevant = gains > 0
+    cum_hits = np.cumsum(relevant, axis=1)
+
+    # 정답 개수와 이상적인 gain 순서 (nDCG 분모)
+    n_relevant = np.bincount(rel_q, minlength=n_queries).astype(float)
+    ideal = np.zeros((n_queries, depth))
+    if len(rel_q):
+        order = np.lexsort((-rel_grades, rel_q))
+        sorted_q = rel_q[order]
+        ideal_rank = np.arange(len(order)) - np.searchsorted(sorted_q, sorted_q, side="left")
+        keep = ideal_rank < depth
+        ideal[sorted_q[keep], ideal_rank[keep]] = rel_grades[order][keep]
+
+    discounts = 1.0 / np.log2(np.arange(depth) + 2)
+    dcg = np.cumsum(gains * discounts, axis=1)
+    idcg = np.cumsum(ideal * discounts, axis=1)
+
+    first_hit = np.argmax(relevant, axis=1)
+    reciprocal_rank = np.where(relevant.any(axis=1), 1.0 / (first_hit + 1), 0.0)
+
+    per_query = {"qid": qids, "mrr": reciprocal_rank}
+    safe_relevant = np.where(n_relevant > 0, n_relevant, 1)
+    for k in ks:
+        per_query[f"precision@{k}"] = cum_hits[:, k - 1] / k
+        per_query[f"recall@{k}"] = np.where(n_relevant > 0, cum_hits[:, k - 1] / safe_relevant, 0.0)
+        per_query[f"hit_rate@{k}"] = (cum_hits[:, k - 1] > 0).astype(float)
+        per_query[f"ndcg@{k}"] = np.divide(dcg[:, k - 1], idcg[:, k - 1], out=np.zeros(n_queries), where=idcg[:, k - 1] > 0)
+
+    per_query_df = pd.DataFrame(per_query)
+    aggregate = per_query_df.drop(columns="qid").mean().to_dict() if n_queries else {}
+    return per_query_df, aggregate
+
+from embedding_cache import EmbeddingCache
+from model_registry import get_model
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+# evaluate_retrieval / evaluate_run 만 쓰는 경우 chain.py(LLM 클라이언트, OpenSearch 풀 등)와
+# 임베딩 캐시 파일을 만들지 않도록, 무거운 객체는 처음 쓸 때 생성
 
 # 사전 학습된 임베딩 모델 (로컬 또는 huggingface)
-similarity_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+# import 시점이 아니라 처음 쓸 때 로드 (model_registry.prewarm 으로 미리 올릴 수 있음)
+SIMILARITY_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite"
+
+_embedding_cache = None
+_chains = {}
+
+def get_embedding_cache():
+    # (모델, 텍스트 해시) 기준 디스크 캐시 - 같은 기준 답변을 반복 인코딩하지 않음
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_entries=100000)
+    return _embedding_cache
 
 def evaluate_similarity(answer, reference_answer):
-    emb1 = similarity_model.encode(answer, convert_to_tensor=True)
-    emb2 = similarity_model.encode(reference_answer, convert_to_tensor=True)
-    similarity = util.cos_sim(emb1, emb2).item()
-    return {"cosine_similarity": similarity}
+    return evaluate_similarity_batch([(answer, reference_answer)])[0]
+
+def evaluate_similarity_batch(pairs, batch_size=64):
+    # pairs: [(answer, reference_answer), ...] - 캐시에 없는 텍스트만 한 번에 인코딩
+    texts = [text for pair in pairs for text in pair]
+    embeddings = get_embedding_cache().encode(get_model(SIMILARITY_MODEL_NAME), SIMILARITY_MODEL_NAME, texts, batch_size=batch_size)
+    if not len(embeddings):
+        return []
+    norms = np.linalg.norm(embeddings, axis=1)
+    norms[norms == 0] = 1.0
+    embeddings = embeddings / norms[:, None]
+    similarities = np.sum(embeddings[0::2] * embeddings[1::2], axis=1)
+    return [{"cosine_similarity": float(similarity)} for similarity in similarities]
+
+def _llm_chain(name, prompt):
+    if name not in _chains:
+        from chain import llm
+        _chains[name] = prompt | llm | StrOutputParser()
+    return _chains[name]
 
 
 evaluation_prompt = PromptTemplate.from_template("""
@@ -30,7 +164,9 @@ Respond in JSON: {{"score": <score>, "reason": "<reason>"}}
 Question: {question}
 Answer: {answer}
 """)
-evaluation_chain = evaluation_prompt | llm | StrOutputParser()
+
+def get_evaluation_chain():
+    return _llm_chain("evaluation", evaluation_prompt)
 
 
 paraphrase_prompt = PromptTemplate.from_template("""
@@ -38,10 +174,12 @@ Paraphrase the following question into a different phrasing that preserves its m
 
 "{question}"
 """)
-paraphrase_chain = paraphrase_prompt | llm | StrOutputParser()
+
+def get_paraphrase_chain():
+    return _llm_chain("paraphrase", paraphrase_prompt)
 
 def evaluate_robustness(original_question, answer_fn):
-    paraphrased_question = paraphrase_chain.invoke({"question": original_question})
+    paraphrased_question = get_paraphrase_chain().invoke({"question": original_question})
     paraphrased_answer = answer_fn(paraphrased_question)
     return {
         "paraphrased_question": paraphrased_question,
@@ -0,0 +1,52 @@
+import threading
+import time
+
+# ==========================================
+# 임베딩 모델 레지스트리 (프로세스 단위, 지연 로딩)
+# ==========================================
+# - import 시점에는 아무 모델도 올리지 않고, get_model() 최초 호출 때 로드
+# - 같은 이름은 프로세스 안에서 한 번만 로드 (쓰레드 안전)
+# - prewarm() 으로 미리 올려두면 fork 한 워커 프로세스가 메모리를 그대로 공유
+# - 모델별 로드 시간을 load_stats() 로 확인
+
+_models = {}
+_load_seconds = {}
+_lock = threading.Lock()
+
+
+def get_model(name, **kwargs):
+    """name 에 해당하는 SentenceTransformer 를 (필요하면 로드해서) 반환합니다."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            start = time.perf_counter()
+            model = SentenceTransformer(name, **kwargs)
+            _load_seconds[name] = time.perf_counter() - start
+            _models[name] = model
+    return model
+
+
+def prewarm(*names):
+    """워커를 띄우기 전에 모델을 미리 로드합니다."""
+    for name in names:
+        get_model(name)
+
+
+def init_worker(*names):
+    # multiprocessing.Pool(initializer=init_worker, initargs=(...)) 용
+    # fork 이전에 prewarm 했다면 이미 로드된 모델을 그대로 쓰고, spawn 이면 워커마다 한 번 로드
+    prewarm(*names)
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def load_stats():
+    """{모델 이름: 로드 시간(초)}"""
+    return {name: round(seconds, 3) for name, seconds in _load_seconds.items()}
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ==========================================
+# OpenSearch 공용 검색 클라이언트
+# ==========================================
+# - requests.Session + HTTPAdapter 커넥션 풀로 keep-alive 연결(TLS 세션)을 재사용
+# - asyncio 환경에서는 같은 풀을 쓰레드로 공유하는 async 메서드 제공
+# - 호출 지연시간과 커넥션 재사용 횟수를 누적해 p50/p95/p99 확인 가능
+
+
+class OpenSearchClient:
+    def __init__(self, base_url, auth=None, pool_maxsize=32, timeout=30, verify=True, max_latency_samples=10000):
+        if not base_url.startswith("http"):
+            base_url = f"https://{base_url}"
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_latency_samples = max_latency_samples
+
+        self.session = requests.Session()
+        self.session.auth = tuple(auth) if auth else None
+        self.session.verify = verify
+        self.session.headers.update({"Connection": "keep-alive"})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._request_count = 0
+        self._error_count = 0
+
+    # ------------------------------------------
+    # 동기 API
+    # ------------------------------------------
+    def request(self, method, path, body=None, params=None, data=None, headers=None):
+        """공용 세션으로 요청을 보내고 JSON 응답을 반환합니다."""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, url, json=body, data=data, params=params, headers=headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+        except Exception:
+            with self._lock:
+                self._error_count += 1
+            raise
+        finally:
+            self._record_latency(time.perf_counter() - start)
+        return response.json() if response.content else {}
+
+    def search(self, index, body, params=None):
+        return self.request("POST", f"{index}/_search", body=body, params=params)
+
+    def msearch(self, index, bodies):
+        """여러 검색을 _msearch 한 번으로 보내고 응답 리스트를 순서대로 반환합니다."""
+        payload = "".join(json.dumps({"index": index}) + "\n" + json.dumps(body) + "\n" for body in bodies)
+        response = self.request(
+            "POST", "_msearch", data=payload.encode("utf-8"), headers={"Content-Type": "application/x-ndjson"}
+        )
+        for item in response["responses"]:
+            if "error" in item:
+                raise RuntimeError(f"msearch 실패: {item['error']}")
+        return response["responses"]
+
+    # ------------------------------------------
+    # 비동기 API (같은 커넥션 풀을 공유)
+    # ------------------------------------------
+    async def arequest(self, method, path, body=None, params=None, data=None, headers=None):
+        return await asyncio.to_thread(self.request, method, path, body, params, data, headers)
+
+    async def asearch(self, index, body, params=None):
+        return await self.arequest("POST", f"{index}/_search", body=body, params=params)
+
+    async def amsearch(self, index, bodies):
+        return await asyncio.to_thread(self.msearch, index, bodies)
+
+    # ------------------------------------------
+    # 지표
+    # ------------------------------------------
+    def _record_latency(self, elapsed):
+        with self._lock:
+            self._request_count += 1
+            self._latencies.append(elapsed)
+            if len(self._latencies) > self.max_latency_samples:
+                del self._latencies[: len(self._latencies) - self.max_latency_samples]
+
+    def _pool_counters(self):
+        # urllib3 커넥션 풀이 실제로 연 커넥션 수 / 처리한 요청 수
+        opened, served = 0, 0
+        for adapter in set(self.session.adapters.values()):
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                served += pool.num_requests
+        return opened, served
+
+    def stats(self):
+        """요청 수, 커넥션 재사용 수, 지연시간 백분위(ms)를 반환합니다."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            request_count = self._request_count
+            error_count = self._error_count
+        opened, served = self._pool_counters()
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            idx = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+            return round(latencies[idx] * 1000, 2)
+
+        return {
+            "requests": request_count,
+            "errors": error_count,
+            "connections_opened": opened,
+            "connections_reused": max(served - opened, 0),
+            "latency_p50_ms": percentile(50),
+            "latency_p95_ms": percentile(95),
+            "latency_p99_ms": percentile(99),
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._latencies.clear()
+            self._request_count = 0
+            self._error_count = 0
+
+    def close(self):
+        self.session.close()
+
+
+# 프로세스 단위로 공유되는 클라이언트 (base_url, auth 별로 하나씩)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url, auth=None, **kwargs):
+    """같은 접속 정보에 대해서는 항상 같은 클라이언트(커넥션 풀)를 돌려줍니다."""
+    key = (base_url, tuple(auth) if auth else None)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenSearchClient(base_url, auth=auth, **kwargs)
+            _clients[key] = client
+        return client
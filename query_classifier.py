@@ -0,0 +1,62 @@
+import re
+
+# ==========================================
+# 로컬 질의 분류기 (규칙 + 키워드)
+# ==========================================
+# classification_chain(LLM) 앞단에서 확실한 경우만 "Question" / "Request" / "Other" 로 바로 분류하고
+# 애매하면 None 을 돌려 LLM 으로 넘깁니다.
+
+# 의문사는 단어 단위로만 인정 ("얼마전", "무엇보다", "몇몇", "어떻게든" 등은 제외)
+# 붙을 수 있는 조사/어미만 허용하고 앞뒤는 한글/영숫자가 아니어야 함
+_INTERROGATIVE_RE = (
+    r"(?<![가-힣A-Za-z0-9])"
+    r"(어떻게|어떤|어느|왜|언제|어디(?:서|에|로|야|예요|에요|인가요|인지)?|누가|누구(?:를|의|야|예요|에요|인가요|인지)?"
+    r"|무엇(?:을|이|인가요|인지|입니까)?|뭐(?:가|를|야|예요|에요|죠|지|고)?|무슨|얼마(?:나|예요|에요|인가요|인지|죠)?"
+    r"|몇\s*(?:개|번|시|명|일|년|월|분|초|건|차|등|퍼센트|%)?)"
+    r"(?![가-힣A-Za-z0-9])"
+)
+
+QUESTION_PATTERNS = [
+    re.compile(r"\?\s*$"),
+    re.compile(_INTERROGATIVE_RE),
+    re.compile(r"(나요|까요|니까|가요|인가|인지|는지|은지|을까|건가|던가|죠|지요|습니까|입니까)\s*[?.!~]*\s*$"),
+    re.compile(r"^(how|what|why|when|where|who|which|is|are|can|could|does|do|should)\b", re.IGNORECASE),
+]
+
+REQUEST_PATTERNS = [
+    re.compile(r"(해\s*줘|해\s*주세요|해\s*주십시오|해\s*주시|부탁|바랍니다|요청합니다)"),
+    re.compile(r"(만들어|작성해|보내|등록해|삭제해|변경해|생성해|번역해|정리해|요약해|추가해|수정해)\s*(줘|주세요|주십시오|주시)"),
+    re.compile(r"^(please|make|create|send|write|generate)\b", re.IGNORECASE),
+]
+
+# 질문/요청 어느 쪽인지 애매하게 만드는 표현 ("알려주세요" 는 정보 요청이라 LLM 판단에 맡김)
+# "can you make ...?" 처럼 질문 형식의 요청도 LLM 판단에 맡김
+AMBIGUOUS_PATTERNS = [
+    re.compile(r"(알려\s*(줘|주세요|주십시오|주시)|설명해|가르쳐)"),
+    re.compile(r"^(can|could|would|will)\s+you\b", re.IGNORECASE),
+]
+
+OTHER_PATTERNS = [
+    re.compile(r"^(안녕|하이|hi|hello|ㅎㅇ|고마워|고맙습니다|감사|ㅋ+|ㅎ+|ㅠ+|ok|오케이)[\s!.~]*$", re.IGNORECASE),
+]
+
+
+def classify_locally(query, min_score=2):
+    """(label, confidence) 를 반환합니다. 확신이 없으면 label 은 None 입니다.
+    신호 하나만으로는 확신하지 않도록 기본적으로 min_score(2)개 이상의 패턴이 맞아야 합니다."""
+    text = query.strip()
+    if not text:
+        return "Other", 1.0
+    if any(p.search(text) for p in OTHER_PATTERNS):
+        return "Other", 0.9
+    if any(p.search(text) for p in AMBIGUOUS_PATTERNS):
+        return None, 0.0
+
+    question_score = sum(1 for p in QUESTION_PATTERNS if p.search(text))
+    request_score = sum(1 for p in REQUEST_PATTERNS if p.search(text))
+
+    if question_score and not request_score and question_score >= min_score:
+        return "Question", round(min(1.0, 0.6 + 0.15 * question_score), 2)
+    if request_score and not question_score and request_score >= min_score:
+        return "Request", round(min(1.0, 0.6 + 0.15 * request_score), 2)
+    return None, 0.0
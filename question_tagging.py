@@ -0,0 +1,270 @@
+import re
+import unicodedata
+
+# ==========================================
+# 질문 엔티티 태깅 (q_improvement 공용)
+# ==========================================
+# - 모든 엔티티 패턴을 named group 하나의 정규식으로 컴파일해 문자열을 한 번만 스캔
+# - 태그에는 원문 기준 start/end 위치가 들어 있어 이후 단계(재작성 등)에서 재검색이 필요 없음
+# - 겹치는 값은 왼쪽에서 먼저 시작하는 매치 하나만 태깅 (같은 위치면 ENTITY_PATTERNS 순서 우선)
+
+ENTITY_PATTERNS = {
+    "PROPOSAL_ID": r"\b[a-z]{3}_\d{4}_\d{4}\b",
+    "TOOL_ID": r"\bEQ\d{4}\b",
+}
+
+
+_LEADING_CLASS_RE = re.compile(r"^(?:\\b)?(\[[^\]^][^\]]*\]|[A-Za-z0-9_])(?![?*]|\{0)")
+
+
+def _first_chars(pattern):
+    # 패턴이 (생략 불가능한) 문자 클래스나 일반 문자로 시작하면 그 문자 집합, 아니면 None
+    if "|" in pattern:
+        return None
+    match = _LEADING_CLASS_RE.match(pattern)
+    if not match:
+        return None
+    token = match.group(1)
+    return token[1:-1] if token.startswith("[") else token
+
+
+def compile_patterns(patterns):
+    alternation = "|".join(f"(?P<{tag_type}>{pattern})" for tag_type, pattern in patterns.items())
+    # 모든 패턴의 첫 글자 집합을 lookahead 로 앞에 두면 대부분의 위치에서 분기를 시도하지 않고 넘어감
+    first = [_first_chars(pattern) for pattern in patterns.values()]
+    if all(first):
+        alternation = f"(?=[{''.join(first)}])(?:{alternation})"
+    return re.compile(alternation)
+
+
+ENTITY_RE = compile_patterns(ENTITY_PATTERNS)
+
+
+def find_entities(text, compiled=ENTITY_RE):
+    """[{"type", "value", "start", "end"}, ...] 를 등장 순서대로 반환합니다."""
+    return [
+        {"type": m.lastgroup, "value": m.group(), "start": m.start(), "end": m.end()}
+        for m in compiled.finditer(text)
+    ]
+
+
+def annotate(text, tags):
+    """start/end 가 있는 태그로 "@TYPE(value)" 표기를 한 번에 다시 조립합니다."""
+    if not tags:
+        return text
+    parts = []
+    last = 0
+    for tag in tags:
+        parts.append(text[last:tag["start"]])
+        parts.append(f"@{tag['type']}({tag['value']})")
+        last = tag["end"]
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def tag_entities(text, compiled=ENTITY_RE):
+    """(태깅된 텍스트, 태그 목록) 을 반환합니다."""
+    tags = find_entities(text, compiled)
+    return annotate(text, tags), tags
+
+
+# ==========================================
+# 태그 기반 질문 재작성
+# ==========================================
+# - 태그의 start/end 로 원문을 한 번만 순회하며 remove/generalize 를 적용
+# - LLM 태그처럼 위치가 없는 태그는 원문에서 값이 나오는 모든 위치를 찾아 span 으로 바꿈
+# - 겹치는 span 은 먼저 시작하는(같으면 더 긴) 쪽만 남김
+
+ACTION_RULES = {
+    "PROPOSAL_ID": {"action": "remove"},
+    "TOOL_ID": {"action": "keep"},
+    "LOT_ID": {"action": "generalize", "replacement": "특정 랏코드"},
+    "PROCESS_NAME": {"action": "keep"},
+    "TEAM_NAME": {"action": "remove"},
+}
+
+_EMPTY_PARENS_RE = re.compile(r"\(\s*\)")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r" ([?.!,])")
+
+
+def locate_spans(text, tags):
+    """start/end 가 없는 태그는 값이 등장하는 모든 위치로 펼쳐서 span 이 있는 태그 목록을 반환합니다."""
+    spans = []
+    for tag in tags:
+        if "start" in tag:
+            spans.append(tag)
+            continue
+        value = tag.get("value")
+        if not value:
+            continue
+        start = text.find(value)
+        while start != -1:
+            spans.append({**tag, "start": start, "end": start + len(value)})
+            start = text.find(value, start + len(value))
+    return spans
+
+
+def resolve_overlaps(spans):
+    kept = []
+    last_end = 0
+    for span in sorted(spans, key=lambda s: (s["start"], s["start"] - s["end"])):
+        if span["start"] >= last_end:
+            kept.append(span)
+            last_end = span["end"]
+    return kept
+
+
+def clean_text(text):
+    """빈 괄호 제거 → 공백 정리 → 문장부호 앞 공백 제거."""
+    if "(" in text:
+        text = _EMPTY_PARENS_RE.sub("", text)
+    text = " ".join(text.split())
+    return _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)
+
+
+def rewrite(text, tags, rules=ACTION_RULES):
+    """ACTION_RULES 의 remove/generalize 를 한 번의 순회로 적용한 질문을 반환합니다."""
+    parts = []
+    last = 0
+    for span in resolve_overlaps(locate_spans(text, tags)):
+        rule = rules.get(span["type"], {})
+        action = rule.get("action", "keep")
+        if action == "keep":
+            continue
+        parts.append(text[last:span["start"]])
+        if action == "generalize":
+            parts.append(rule["replacement"])
+        last = span["end"]
+    parts.append(text[last:])
+    return clean_text("".join(parts))
+
+
+# ==========================================
+# 로컬 NER (LOT_ID 정규식 + 공정/팀 이름 사전)
+# ==========================================
+# - LOT_ID 는 패턴이 고정이라 정규식으로, PROCESS_NAME / TEAM_NAME 은 닫힌 어휘라 Aho–Corasick 사전으로 태깅
+# - 한국어 조사("식각에서", "설비기술팀에")가 바로 붙으므로 사전 매칭 뒤에는 조사(_JOSA_RE)만 허용
+#   ("품질팀장님께" 처럼 다른 낱말의 일부인 경우는 태깅하지 않음)
+# - 사전은 rag_dictionary.py 의 용어 클러스터로 확장 가능 (명시적으로 from_clusters 를 쓸 때만)
+#   같은 클러스터이면서 용어 임베딩이 seed 와 충분히 비슷한 용어만, remove 타입이 아닐 때만 추가
+# - 팀/공정처럼 보이지만 사전에 없는 부분(residual)이 남을 때만 LLM 태거를 부르면 됨
+
+LOCAL_PATTERNS = {
+    # 4 또는 6으로 시작하는 10자리, 뒤에 조사가 붙어도 매칭되도록 영숫자 경계만 확인
+    # 영문자가 하나 이상 있어야 함 (금액 "6000000000원" 같은 숫자만 10자리는 제외)
+    "LOT_ID": r"(?<![A-Za-z0-9])[46](?=[A-Za-z0-9]{0,8}[A-Za-z])[A-Za-z0-9]{9}(?![A-Za-z0-9])",
+}
+
+# 정확히 일치해야 하는 식별자 (PROPOSAL_ID / TOOL_ID / LOT_ID)
+ID_RE = compile_patterns({**ENTITY_PATTERNS, **LOCAL_PATTERNS})
+
+
+def id_signature(text):
+    """질문에 나오는 식별자의 (type, value) 정렬 튜플. 캐시에서 ID 까지 같은 질문만 묶을 때 사용합니다."""
+    text = unicodedata.normalize("NFKC", text)
+    return tuple(sorted({(tag["type"], tag["value"]) for tag in find_entities(text, ID_RE)}))
+
+
+GAZETTEER = {
+    "PROCESS_NAME": ["포토", "식각", "증착", "확산", "이온주입", "세정", "CMP", "CVD", "PVD", "ALD", "EDS", "패키징"],
+    "TEAM_NAME": ["품질팀", "설비기술팀", "공정기술팀", "제조팀", "수율팀"],
+}
+
+# 사전 용어 바로 뒤에 올 수 있는 조사 (없거나 조사 하나 뒤 단어 경계)
+_JOSA_RE = re.compile(
+    r"(?:에서는|에서도|에게는|에는|에도|으로는|로는|에서|에게|께서|까지|부터|으로|이랑|랑|에|은|는|이|가|을|를|의|과|와|로|도|만)?"
+    r"(?![가-힣A-Za-z0-9])"
+)
+
+# 사전에 없는 팀/공정 이름 후보 (이게 남아 있을 때만 LLM 호출)
+_UNKNOWN_ENTITY_RE = re.compile(r"\b[가-힣A-Za-z0-9]+?(?:팀|그룹|파트|센터|공정)")
+
+
+def load_gazetteer(path):
+    """{"PROCESS_NAME": [...], "TEAM_NAME": [...]} 형태의 JSON 을 읽습니다."""
+    import json
+
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def expand_gazetteer(gazetteer, clusters, embed_fn, min_similarity=0.8, rules=ACTION_RULES):
+    """seed 와 같은 클러스터의 용어 중, 용어 자체의 임베딩이 같은 타입 seed 와 min_similarity 이상인 것만 추가합니다.
+    클러스터는 문맥 임베딩이라 함께 나오는 용어("라인", "점검")도 묶이므로 클러스터만으로는 추가하지 않습니다.
+    remove 타입(잘못 확장되면 질문의 단어를 지움)과 타입이 둘 이상 섞인 클러스터는 건너뜁니다."""
+    import numpy as np
+
+    type_of = {name: tag_type for tag_type, names in gazetteer.items() for name in names}
+    expanded = {tag_type: list(names) for tag_type, names in gazetteer.items()}
+    for terms in clusters.values():
+        types = {type_of[term] for term in terms if term in type_of}
+        if len(types) != 1:
+            continue
+        tag_type = types.pop()
+        if rules.get(tag_type, {}).get("action") == "remove":
+            continue
+        seeds = [term for term in terms if term in type_of]
+        candidates = [term for term in terms if term not in type_of]
+        if not candidates:
+            continue
+        vectors = np.asarray(embed_fn(seeds + candidates), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        similarity = vectors[len(seeds):] @ vectors[:len(seeds)].T
+        expanded[tag_type].extend(
+            term for term, best in zip(candidates, similarity.max(axis=1)) if best >= min_similarity
+        )
+    return expanded
+
+
+class LocalEntityTagger:
+    def __init__(self, gazetteer=None, patterns=None):
+        from term_matcher import TermMatcher
+
+        self.gazetteer = GAZETTEER if gazetteer is None else gazetteer
+        self.type_of = {name: tag_type for tag_type, names in self.gazetteer.items() for name in names}
+        self.matcher = TermMatcher(self.type_of, left_boundary=True, right_boundary=False)  # 오른쪽은 _JOSA_RE 로 확인
+        self.pattern_re = compile_patterns(LOCAL_PATTERNS if patterns is None else patterns)
+
+    @classmethod
+    def from_clusters(cls, cluster_state_path, embed_fn, gazetteer=None, min_similarity=0.8, **kwargs):
+        """rag_dictionary 의 IncrementalClusterer 상태(.npz)로 사전을 확장해 만듭니다 (expand_gazetteer 참고).
+        embed_fn: 용어 목록 → 임베딩 배열 (예: get_model(...).encode)"""
+        from clustering import IncrementalClusterer
+
+        clusters = IncrementalClusterer.load(cluster_state_path).clusters()
+        gazetteer = GAZETTEER if gazetteer is None else gazetteer
+        return cls(expand_gazetteer(gazetteer, clusters, embed_fn, min_similarity=min_similarity), **kwargs)
+
+    def tag(self, text):
+        """[{"type", "value", "start", "end"}, ...] 를 위치 순서대로 반환합니다."""
+        spans = find_entities(text, self.pattern_re)
+        # 조사 검사를 먼저 해야 "품질팀장" 에서 잘린 "품질팀" 대신 다른(짧은) 매치가 남을 수 있음
+        spans += [
+            {"type": self.type_of[term], "value": term, "start": start, "end": end}
+            for start, end, term in self.matcher.finditer(text)
+            if _JOSA_RE.match(text, end)
+        ]
+        return resolve_overlaps(spans)
+
+    def residual(self, text, tags):
+        """태그와 겹치지 않는 팀/공정 이름 후보 [(start, end), ...] 를 반환합니다."""
+        return [
+            m.span() for m in _UNKNOWN_ENTITY_RE.finditer(text)
+            if not any(tag["start"] < m.end() and m.start() < tag["end"] for tag in tags)
+        ]
+
+
+
+if __name__ == "__main__":
+    # 회귀 확인: 사전 용어가 다른 낱말의 일부("품질팀장")면 태깅하지 않고, 조사가 붙은 경우만 태깅
+    tagger = LocalEntityTagger()
+    for question, expected in [
+        ("품질팀장님께 승인 요청 방법은?", []),
+        ("제조팀장 결재가 필요한가요?", []),
+        ("설비기술팀에 문의했는데 식각에서는 어떤가요?", ["설비기술팀", "식각"]),
+        ("수율팀 4ABCD12345 확인 요청", ["4ABCD12345", "수율팀"]),
+        ("6000000000원 예산 집행은 누가 승인하나요?", []),
+    ]:
+        values = sorted(tag["value"] for tag in tagger.tag(question))
+        assert values == sorted(expected), (question, values)
+        print(question, "->", rewrite(question, tagger.tag(question)))
@@ -1,100 +1,138 @@
 # 필요한 라이브러리 설치 필요:
 # pip install sentence-transformers scikit-learn pandas
 
-import re
-from itertools import combinations
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.cluster import AgglomerativeClustering
 from sklearn.feature_extraction.text import TfidfVectorizer
 import pandas as pd
 import numpy as np
+from similarity import find_similar_pairs
+from clustering import IncrementalClusterer
+from term_matcher import TermMatcher
+from model_registry import get_model
 
-# 1. 예시 문서 chunk (RAG에서 쪼갠 상태라고 가정)
-chunks = [
-    "최근 rg 라인의 수율이 향상되었다. 기존 대비 공정 안정성이 좋아졌다.",
-    "rigel 공정은 고속 라인에서 사용되며, rg와 동일 계열이다.",
-    "canopus 제품은 cp로도 불리며, 주로 소비자용 라인에서 쓰인다.",
-    "캐노는 cp 제품군 중 고성능 모델을 지칭한다.",
-    "홍길동 부장이 보고서를 검토했다.",
-    "김과장은 DRAM 라인에 대해 리뷰했다.",
-    "강부장은 리지드 공정 이상에 대해 보고했다.",
-    "리겔은 고성능 rg 제품이다. 클레임 이슈가 있었다."
-]
-
-# 2. TF-IDF로 주요 단어 자동 추출
-vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=30, token_pattern=r'\b\w+\b')
-X = vectorizer.fit_transform(chunks)
-auto_terms = vectorizer.get_feature_names_out()
-
-# 3. 단어별 문맥 수집
-term_contexts = {term: [] for term in auto_terms}
-for chunk in chunks:
-    for term in auto_terms:
-        if re.search(rf"\b{re.escape(term)}\b", chunk):
+# 클러스터링 방식: True 면 증분 클러스터링, False 면 전체 AgglomerativeClustering
+INCREMENTAL_CLUSTERING = True
+CLUSTER_STATE_PATH = "rag_dictionary_clusters.npz"
+
+# 문맥 임베딩 설정 (4단계)
+EMBED_BATCH_SIZE = 64
+EMBED_NUM_WORKERS = 0  # 0/1 이면 현재 프로세스에서만 인코딩, 2 이상이면 spawn 방식 CPU 워커 풀 사용
+
+def build_term_representations(term_contexts, model, batch_size=EMBED_BATCH_SIZE, num_workers=EMBED_NUM_WORKERS):
+    """용어별 문맥을 길이순으로 묶어 배치 인코딩하고 {term: embedding} 을 반환합니다."""
+    items = [(term, " ".join(contexts)) for term, contexts in term_contexts.items() if contexts]
+    if not items:
+        return {}
+
+    # 비슷한 길이끼리 같은 배치에 들어가도록 정렬 (padding 감소)
+    order = sorted(range(len(items)), key=lambda i: len(items[i][1]))
+    texts = [items[i][1] for i in order]
+
+    if num_workers > 1:
+        # torch 모델이 로드된 프로세스를 fork 하면 OpenMP/intra-op 스레드 풀 때문에 멈출 수 있으므로
+        # sentence-transformers 의 spawn 기반 멀티 프로세스 풀 사용 (입력 순서는 유지됨)
+        chunk_size = max(batch_size, -(-len(texts) // (num_workers * 4)))
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * num_workers)
+        try:
+            embeddings = model.encode_multi_process(texts, pool, batch_size=batch_size, chunk_size=chunk_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        embeddings = model.encode(texts, batch_size=batch_size)
+
+    # 원래 용어 순서로 되돌림
+    sorted_embeddings = [None] * len(items)
+    for position, i in enumerate(order):
+        sorted_embeddings[i] = embeddings[position]
+    return {term: embedding for (term, _), embedding in zip(items, sorted_embeddings)}
+
+
+# EMBED_NUM_WORKERS > 1 이면 워커를 spawn 으로 띄우고, 워커는 이 파일을 다시 import 하므로
+# 실제 처리 단계는 __main__ 에서만 실행
+if __name__ == "__main__":
+    # 1. 예시 문서 chunk (RAG에서 쪼갠 상태라고 가정)
+    chunks = [
+        "최근 rg 라인의 수율이 향상되었다. 기존 대비 공정 안정성이 좋아졌다.",
+        "rigel 공정은 고속 라인에서 사용되며, rg와 동일 계열이다.",
+        "canopus 제품은 cp로도 불리며, 주로 소비자용 라인에서 쓰인다.",
+        "캐노는 cp 제품군 중 고성능 모델을 지칭한다.",
+        "홍길동 부장이 보고서를 검토했다.",
+        "김과장은 DRAM 라인에 대해 리뷰했다.",
+        "강부장은 리지드 공정 이상에 대해 보고했다.",
+        "리겔은 고성능 rg 제품이다. 클레임 이슈가 있었다."
+    ]
+
+    # 2. TF-IDF로 주요 단어 자동 추출
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=30, token_pattern=r'\b\w+\b')
+    X = vectorizer.fit_transform(chunks)
+    auto_terms = vectorizer.get_feature_names_out()
+
+    # 3. 단어별 문맥 수집 (용어 전체를 하나의 Aho–Corasick 매처로 만들어 청크당 한 번만 스캔)
+    term_matcher = TermMatcher(auto_terms)
+    chunk_matches = [term_matcher.find_all(chunk) for chunk in chunks]
+
+    term_contexts = {term: [] for term in auto_terms}
+    for chunk, matches in zip(chunks, chunk_matches):
+        for term in dict.fromkeys(term for _, _, term in matches):
             term_contexts[term].append(chunk)
 
-# 4. 문맥 임베딩
-model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-term_representations = {}
-for term, contexts in term_contexts.items():
-    if contexts:
-        joined_context = " ".join(contexts)
-        embedding = model.encode(joined_context)
-        term_representations[term] = embedding
-
-# 5. 유사한 단어쌍 추출
-terms = list(term_representations.keys())
-vectors = np.array([term_representations[t] for t in terms])
-similarity_matrix = cosine_similarity(vectors)
-
-similar_pairs = []
-for i, j in combinations(range(len(terms)), 2):
-    sim = similarity_matrix[i][j]
-    if sim > 0.8:
-        similar_pairs.append({
-            "Entity A": terms[i],
-            "Entity B": terms[j],
-            "Cosine Similarity": round(sim, 4)
-        })
-df_similar = pd.DataFrame(similar_pairs)
-
-# 6. 클러스터링
-distance_matrix = 1 - similarity_matrix
-clustering = AgglomerativeClustering(
-    affinity='precomputed',
-    linkage='average',
-    distance_threshold=0.25,
-    n_clusters=None
-)
-labels = clustering.fit_predict(distance_matrix)
-
-cluster_df = pd.DataFrame({
-    "Term": terms,
-    "Cluster ID": labels
-}).sort_values("Cluster ID")
-
-# 7. NER 학습용 구조 생성
-ner_data = []
-for chunk in chunks:
-    for term, cluster in zip(cluster_df["Term"], cluster_df["Cluster ID"]):
-        for match in re.finditer(rf"\b{re.escape(term)}\b", chunk):
-            ner_data.append({
-                "Text": chunk,
-                "Entity": term,
-                "Start": match.start(),
-                "End": match.end(),
-                "Label": f"CLUSTER_{cluster}"
-            })
-
-df_ner = pd.DataFrame(ner_data)
-
-# 8. 결과 출력 예시 (원하는 경우 저장도 가능)
-print("\n[유사한 단어쌍]")
-print(df_similar)
-
-print("\n[클러스터링 결과]")
-print(cluster_df)
-
-print("\n[NER 학습용 구조]")
-print(df_ner.head())
+    # 4. 문맥 임베딩 (길이순 정렬 후 배치 인코딩, 필요하면 CPU 워커 여러 개 사용)
+    model = get_model("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    term_representations = build_term_representations(term_contexts, model)
+
+    # 5. 유사한 단어쌍 추출 (행 블록 단위로 유사도 계산, N x N 행렬을 만들지 않음)
+    terms = list(term_representations.keys())
+    vectors = np.array([term_representations[t] for t in terms])
+    similar_pairs = find_similar_pairs(terms, vectors, threshold=0.8, key_a="Entity A", key_b="Entity B")
+    df_similar = pd.DataFrame(similar_pairs)
+
+    # 6. 클러스터링
+    if INCREMENTAL_CLUSTERING:
+        # 저장된 중심에 새 항목만 배정하고 주기적으로 병합 (클러스터 ID 는 실행 간 유지)
+        clusterer = IncrementalClusterer.load(CLUSTER_STATE_PATH, distance_threshold=0.25)
+        clusterer.partial_fit(terms, vectors)
+        clusterer.merge()
+        clusterer.save(CLUSTER_STATE_PATH)
+        labels = clusterer.labels(terms)
+    else:
+        similarity_matrix = cosine_similarity(vectors)
+        distance_matrix = 1 - similarity_matrix
+        clustering = AgglomerativeClustering(
+            affinity='precomputed',
+            linkage='average',
+            distance_threshold=0.25,
+            n_clusters=None
+        )
+        labels = clustering.fit_predict(distance_matrix)
+
+    cluster_df = pd.DataFrame({
+        "Term": terms,
+        "Cluster ID": labels
+    }).sort_values("Cluster ID")
+
+    # 7. NER 학습용 구조 생성 (3단계에서 찾은 매치 위치를 재사용)
+    term_clusters = dict(zip(cluster_df["Term"], cluster_df["Cluster ID"]))
+    ner_data = []
+    for chunk, matches in zip(chunks, chunk_matches):
+        for start, end, term in matches:
+            if term in term_clusters:
+                ner_data.append({
+                    "Text": chunk,
+                    "Entity": term,
+                    "Start": start,
+                    "End": end,
+                    "Label": f"CLUSTER_{term_clusters[term]}"
+                })
+
+    df_ner = pd.DataFrame(ner_data)
+
+    # 8. 결과 출력 예시 (원하는 경우 저장도 가능)
+    print("\n[유사한 단어쌍]")
+    print(df_similar)
+
+    print("\n[클러스터링 결과]")
+    print(cluster_df)
+
+    print("\n[NER 학습용 구조]")
+    print(df_ner.head())
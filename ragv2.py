@@ -1,40 +1,176 @@
-import requests import pandas as pd import numpy as np from sklearn.metrics.pairwise import cosine_similarity from sklearn.cluster import AgglomerativeClustering
-
-1. OpenSearch에서 미리 임베딩된 벡터 불러오기
-
-host = "https://your-opensearch-domain" index_name = "your-index-name" auth = ("your-username", "your-password")
-
-2. 쿼리를 통해 임베딩된 청크 벡터 가져오기 (이미 저장된 벡터)
-
-def get_embeddings_from_opensearch(): url = f"{host}/{index_name}/_search" query = { "size": 1000,  # 가져올 벡터 수 "query": { "match_all": {} }, "_source": ["text", "passage_chunk_embedding"] } response = requests.post(url, json=query, auth=auth).json() docs = response['hits']['hits']
-
-texts = [doc['_source']['text'] for doc in docs]
-embeddings = [doc['_source']['passage_chunk_embedding'] for doc in docs]
-return texts, np.array(embeddings)
-
-3. 임베딩 및 텍스트 로드
-
-texts, vectors = get_embeddings_from_opensearch()
-
-4. 유사도 계산 (cosine similarity)
-
-similarity_matrix = cosine_similarity(vectors)
-
-5. 유사한 단어쌍 추출
-
-similar_pairs = [] for i in range(len(texts)): for j in range(i + 1, len(texts)): sim = similarity_matrix[i][j] if sim > 0.8:  # 유사도 기준 조정 가능 similar_pairs.append({ "Text A": texts[i], "Text B": texts[j], "Cosine Similarity": round(sim, 4) })
-
-6. 클러스터링 (계층적 군집화)
-
-distance_matrix = 1 - similarity_matrix clustering = AgglomerativeClustering( affinity='precomputed', linkage='average', distance_threshold=0.25, n_clusters=None ) labels = clustering.fit_predict(distance_matrix)
-
-7. 결과 정리
-
-cluster_df = pd.DataFrame({ "Text": texts, "Cluster ID": labels }).sort_values("Cluster ID")
-
-8. 출력
-
-print("[유사한 단어쌍]") print(pd.DataFrame(similar_pairs))
-
-print("[클러스터링 결과]") print(cluster_df)
-
+import os
+import json
+import warnings
+import pandas as pd
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.cluster import AgglomerativeClustering
+from opensearch_client import get_client
+from similarity import find_similar_pairs
+from clustering import IncrementalClusterer
+
+# 클러스터링 방식: True 면 증분 클러스터링, False 면 전체 AgglomerativeClustering
+INCREMENTAL_CLUSTERING = True
+CLUSTER_STATE_PATH = "ragv2_clusters.npz"
+
+# 1. OpenSearch에서 미리 임베딩된 벡터 불러오기
+host = "https://your-opensearch-domain"
+index_name = "your-index-name"
+auth = ("your-username", "your-password")
+
+opensearch = get_client(host, auth)
+
+# 2. 쿼리를 통해 임베딩된 청크 벡터 가져오기 (이미 저장된 벡터)
+# PIT(point-in-time) + search_after 로 인덱스 전체를 배치 단위로 순회 (size 제한으로 잘리지 않음)
+PIT_KEEP_ALIVE = "5m"
+# search_after 정렬 키는 샤드를 넘어 고유해야 함 (_doc 는 샤드 내 번호라 페이지 경계에서 문서가 빠질 수 있음)
+# _shard_doc 를 지원하지 않는 클러스터라면 고유한 keyword 필드로 바꿀 것 (예: [{"doc_id": "asc"}])
+PIT_SORT = [{"_shard_doc": "asc"}]
+SOURCE_FIELDS = ["text", "url", "passage_chunk_embedding"]
+
+def iter_embedding_batches(batch_size=1000, keep_alive=PIT_KEEP_ALIVE, method="pit"):
+    """인덱스 전체를 배치 단위로 읽어 {total, ids, texts, urls, embeddings(float32)} 를 차례로 반환합니다."""
+    if method == "scroll":
+        yield from _iter_scroll_batches(batch_size, keep_alive)
+        return
+
+    pit = opensearch.request("POST", f"{index_name}/_search/point_in_time", params={"keep_alive": keep_alive})
+    pit_id = pit["pit_id"]
+    search_after = None
+    try:
+        while True:
+            query = {
+                "size": batch_size,
+                "query": {"match_all": {}},
+                "_source": SOURCE_FIELDS,
+                "pit": {"id": pit_id, "keep_alive": keep_alive},
+                "sort": PIT_SORT,
+                "track_total_hits": True,
+            }
+            if search_after is not None:
+                query["search_after"] = search_after
+            response = opensearch.request("POST", "_search", body=query)
+            pit_id = response.get("pit_id", pit_id)
+            docs = response["hits"]["hits"]
+            if not docs:
+                break
+            yield _to_batch(response, docs)
+            search_after = docs[-1]["sort"]
+    finally:
+        opensearch.request("DELETE", "_search/point_in_time", body={"pit_id": [pit_id]})
+
+def _iter_scroll_batches(batch_size, keep_alive):
+    # PIT 를 지원하지 않는 클러스터용 scroll 경로
+    query = {
+        "size": batch_size,
+        "query": {"match_all": {}},
+        "_source": SOURCE_FIELDS,
+        "sort": ["_doc"],
+        "track_total_hits": True,
+    }
+    response = opensearch.request("POST", f"{index_name}/_search", body=query, params={"scroll": keep_alive})
+    scroll_id = response.get("_scroll_id")
+    try:
+        while response["hits"]["hits"]:
+            yield _to_batch(response, response["hits"]["hits"])
+            response = opensearch.request("POST", "_search/scroll", body={"scroll": keep_alive, "scroll_id": scroll_id})
+            scroll_id = response.get("_scroll_id", scroll_id)
+    finally:
+        if scroll_id:
+            opensearch.request("DELETE", "_search/scroll", body={"scroll_id": [scroll_id]})
+
+def _to_batch(response, docs):
+    total = response["hits"]["total"]
+    total = total["value"] if isinstance(total, dict) else total
+    return {
+        "total": total,
+        "ids": [doc["_id"] for doc in docs],
+        "texts": [doc["_source"]["text"] for doc in docs],
+        "urls": [doc["_source"].get("url") for doc in docs],
+        "embeddings": np.asarray([doc["_source"]["passage_chunk_embedding"] for doc in docs], dtype=np.float32),
+    }
+
+def get_embeddings_from_opensearch(out_path=None, batch_size=1000, method="pit", allow_partial=False):
+    """전체 벡터를 미리 할당한 float32 배열에 바로 기록하고 (ids, texts, vectors) 를 반환합니다.
+    out_path(.npy)를 주면 np.memmap 에 기록하고, id/text/url 은 옆에 .meta.jsonl 로 저장합니다.
+    읽은 문서 수가 hits.total 보다 적으면 RuntimeError (allow_partial=True 면 경고만 출력)."""
+    ids = []
+    texts = []
+    vectors = None
+    filled = 0
+    meta_file = open(os.path.splitext(out_path)[0] + ".meta.jsonl", "w", encoding="utf-8") if out_path else None
+    batches = iter_embedding_batches(batch_size=batch_size, method=method)
+    try:
+        for batch in batches:
+            embeddings = batch["embeddings"]
+            if vectors is None:
+                shape = (batch["total"], embeddings.shape[1])
+                if out_path:
+                    vectors = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32, shape=shape)
+                else:
+                    vectors = np.empty(shape, dtype=np.float32)
+            n = min(len(embeddings), len(vectors) - filled)
+            vectors[filled:filled + n] = embeddings[:n]
+            filled += n
+            ids.extend(batch["ids"][:n])
+            texts.extend(batch["texts"][:n])
+            if meta_file:
+                for doc_id, text, url in zip(batch["ids"][:n], batch["texts"][:n], batch["urls"][:n]):
+                    meta_file.write(json.dumps({"id": doc_id, "text": text, "url": url}, ensure_ascii=False) + "\n")
+            if filled >= len(vectors):
+                break
+    finally:
+        batches.close()  # PIT/scroll 컨텍스트 정리
+        if meta_file:
+            meta_file.close()
+
+    if vectors is None:
+        return ids, texts, np.empty((0, 0), dtype=np.float32)
+    if isinstance(vectors, np.memmap):
+        vectors.flush()
+    if filled < len(vectors):
+        message = f"전체 {len(vectors)}개 중 {filled}개만 읽었습니다. 정렬 키(PIT_SORT)가 고유한지 확인하세요."
+        if not allow_partial:
+            raise RuntimeError(message)
+        warnings.warn(message)
+    return ids, texts, vectors[:filled]
+
+# 3. 임베딩 및 텍스트 로드
+doc_ids, texts, vectors = get_embeddings_from_opensearch()
+
+# 4~5. 유사한 단어쌍 추출 (행 블록 단위로 유사도 계산, N x N 행렬을 만들지 않음)
+similar_pairs = find_similar_pairs(texts, vectors, threshold=0.8, key_a="Text A", key_b="Text B")  # 유사도 기준 조정 가능
+
+# 6. 클러스터링 (계층적 군집화)
+if INCREMENTAL_CLUSTERING:
+    # 저장된 중심에 새 항목만 배정하고 주기적으로 병합 (클러스터 ID 는 실행 간 유지)
+    # 본문이 같은 청크도 따로 배정되도록 OpenSearch _id 를 key 로 사용
+    clusterer = IncrementalClusterer.load(CLUSTER_STATE_PATH, distance_threshold=0.25)
+    clusterer.partial_fit(doc_ids, vectors)
+    clusterer.merge()
+    clusterer.save(CLUSTER_STATE_PATH)
+    labels = clusterer.labels(doc_ids)
+else:
+    similarity_matrix = cosine_similarity(vectors)
+    distance_matrix = 1 - similarity_matrix
+    clustering = AgglomerativeClustering(
+        affinity='precomputed',
+        linkage='average',
+        distance_threshold=0.25,
+        n_clusters=None
+    )
+    labels = clustering.fit_predict(distance_matrix)
+
+# 7. 결과 정리
+cluster_df = pd.DataFrame({
+    "ID": doc_ids,
+    "Text": texts,
+    "Cluster ID": labels
+}).sort_values("Cluster ID")
+
+# 8. 출력
+print("[유사한 단어쌍]")
+print(pd.DataFrame(similar_pairs))
+
+print("[클러스터링 결과]")
+print(cluster_df)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import re
+import time
+from pathlib import Path
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+# ==========================================
+# 병렬 listwise 리랭커 (prompt.py 의 상위 5개 순위 템플릿 사용)
+# ==========================================
+# - 후보 문서를 sliding window(window_size, stride)로 나눠 창마다 LLM 호출을 동시에 실행
+# - 창별 relevance_score JSON 을 합쳐 문서별 최고 점수로 전체 top_k 를 만듦
+# - budget_seconds 안에 모든 창이 끝나지 않으면 남은 호출을 취소하고 검색 순서를 그대로 사용
+
+RERANK_TEMPLATE = Path(__file__).with_name("prompt.py").read_text(encoding="utf-8")
+
+rerank_prompt = PromptTemplate(
+    template=RERANK_TEMPLATE,
+    template_format="jinja2",
+    input_variables=["original_question", "candidate_docs"],
+)
+
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+
+def parse_rankings(output):
+    """LLM 출력에서 [{"doc_id", "relevance_score", ...}] 배열만 꺼냅니다."""
+    match = _JSON_ARRAY_RE.search(output)
+    if not match:
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return []
+    return [item for item in items if isinstance(item, dict) and "doc_id" in item]
+
+
+def make_windows(candidates, window_size=10, stride=5):
+    if len(candidates) <= window_size:
+        return [candidates]
+    windows = [candidates[start:start + window_size] for start in range(0, len(candidates) - window_size + 1, stride)]
+    if (len(candidates) - window_size) % stride:
+        windows.append(candidates[-window_size:])
+    return windows
+
+
+def merge_rankings(candidates, window_rankings, top_k):
+    # 문서별 최고 relevance_score, 동점이면 원래 검색 순서
+    best = {}
+    for rankings in window_rankings:
+        for item in rankings:
+            try:
+                score = float(item.get("relevance_score", 0))
+            except (TypeError, ValueError):
+                continue
+            doc_id = str(item["doc_id"])
+            best[doc_id] = max(score, best.get(doc_id, float("-inf")))
+
+    order = {str(doc["id"]): i for i, doc in enumerate(candidates)}
+    scored = sorted((doc_id for doc_id in best if doc_id in order), key=lambda d: (-best[d], order[d]))
+    rest = [str(doc["id"]) for doc in candidates if str(doc["id"]) not in best]
+    by_id = {str(doc["id"]): doc for doc in candidates}
+    return [
+        {**by_id[doc_id], "relevance_score": best.get(doc_id)}
+        for doc_id in (scored + rest)[:top_k]
+    ]
+
+
+async def arerank(question, candidates, top_k=5, window_size=10, stride=5, budget_seconds=5.0,
+                  max_concurrency=8, llm=None):
+    """candidates: [{"id", "content"}, ...] (검색 순서).
+    {"results": 상위 top_k, "source": "rerank" | "fallback_timeout" | "fallback_error", "elapsed_ms"} 를 반환합니다."""
+    start = time.perf_counter()
+    if llm is None:
+        from chain import llm
+    chain = rerank_prompt | llm | StrOutputParser()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def score_window(window):
+        async with semaphore:
+            output = await chain.ainvoke({"original_question": question, "candidate_docs": window})
+        return parse_rankings(output)
+
+    def fallback(source):
+        return {
+            "results": [{**doc, "relevance_score": None} for doc in candidates[:top_k]],
+            "source": source,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    tasks = [asyncio.ensure_future(score_window(window)) for window in make_windows(candidates, window_size, stride)]
+    done, pending = await asyncio.wait(tasks, timeout=budget_seconds)
+    if pending:
+        for task in pending:
+            task.cancel()
+        return fallback("fallback_timeout")
+
+    window_rankings = [task.result() for task in tasks if not task.exception()]
+    if not any(window_rankings):
+        return fallback("fallback_error")
+    return {
+        "results": merge_rankings(candidates, window_rankings, top_k),
+        "source": "rerank",
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def rerank(question, candidates, **kwargs):
+    return asyncio.run(arerank(question, candidates, **kwargs))
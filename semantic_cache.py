@@ -0,0 +1,129 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# ==========================================
+# 시맨틱 응답 캐시
+# ==========================================
+# - 질문 임베딩의 cosine 유사도가 threshold 이상이면 저장된 응답을 그대로 반환
+# - 같은 문장(공백/대소문자 정규화 후)은 임베딩 계산 없이 바로 조회
+# - TTL 이 지난 항목은 무효, max_entries 를 넘으면 가장 오래 안 쓴 항목부터 제거 (LRU)
+# - key_fn 을 주면 key_fn(질문) 이 정확히 같은 항목끼리만 유사도 비교
+#   (랏/설비 ID 만 다른 질문은 임베딩이 거의 같아서 다른 질문의 답을 돌려주는 것을 막기 위함)
+
+
+def _normalize_text(text):
+    return " ".join(text.split()).casefold()
+
+
+class SemanticCache:
+    def __init__(self, embed_fn, threshold=0.92, ttl_seconds=3600, max_entries=1000, key_fn=None):
+        self.embed_fn = embed_fn
+        self.key_fn = key_fn
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._matrix = None                       # (max_entries, dim) 정규화된 질문 벡터
+        self._entries = OrderedDict()             # slot -> {"key", "value", "created"} (LRU 순서)
+        self._exact = {}                          # 정규화된 질문 -> slot
+        self._by_ids = {}                         # key_fn 결과 -> {slot, ...}
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+
+    def _embed(self, text):
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, slot):
+        entry = self._entries.pop(slot)
+        self._exact.pop(entry["key"], None)
+        slots = self._by_ids.get(entry["ids"])
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del self._by_ids[entry["ids"]]
+        self._free.append(slot)
+
+    def _alive(self, slot, now):
+        if now - self._entries[slot]["created"] <= self.ttl_seconds:
+            return True
+        self._drop(slot)
+        return False
+
+    def _ids(self, query):
+        return self.key_fn(query) if self.key_fn else ()
+
+    def lookup(self, query):
+        """캐시된 값의 복사본을 반환하고, 없으면 None 을 반환합니다 (호출 쪽에서 고쳐도 캐시는 그대로)."""
+        key = _normalize_text(query)
+        ids = self._ids(query)
+        now = time.time()
+        with self._lock:
+            slot = self._exact.get(key)
+            if slot is not None and self._alive(slot, now):
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                self.exact_hits += 1
+                return copy.deepcopy(self._entries[slot]["value"])
+            if not self._by_ids.get(ids):
+                self.misses += 1
+                return None
+
+        vector = self._embed(query)
+        with self._lock:
+            candidates = np.fromiter(self._by_ids.get(ids, ()), dtype=np.int64)
+            if self._matrix is None or not len(candidates):
+                self.misses += 1
+                return None
+            similarities = self._matrix[candidates] @ vector
+            best = int(np.argmax(similarities))
+            slot = int(candidates[best])
+            if similarities[best] >= self.threshold and self._alive(slot, now):
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return copy.deepcopy(self._entries[slot]["value"])
+            self.misses += 1
+            return None
+
+    def store(self, query, value):
+        # 넘겨받은 값은 호출 쪽에서 계속 쓰므로 복사본을 저장
+        value = copy.deepcopy(value)
+        key = _normalize_text(query)
+        ids = self._ids(query)
+        vector = self._embed(query)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if key in self._exact:
+                self._drop(self._exact[key])
+            if not self._free:
+                self._drop(next(iter(self._entries)))
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._entries[slot] = {"key": key, "ids": ids, "value": value, "created": time.time()}
+            self._exact[key] = slot
+            self._by_ids.setdefault(ids, set()).add(slot)
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._drop(slot)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+        }
@@ -0,0 +1,113 @@
+import numpy as np
+
+# ==========================================
+# 대용량 유사쌍 탐색
+# ==========================================
+# N x N cosine_similarity 행렬을 만들지 않고 행 블록 단위로 내적을 계산해
+# 임계값을 넘는 (i, j) 쌍만 남깁니다. 메모리는 block_size^2 수준으로 고정됩니다.
+# method="lsh" 를 쓰면 random projection 해시로 후보쌍만 비교합니다 (근사).
+
+
+def _row_norms(vectors, block_size):
+    norms = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        norms[start:start + block_size] = np.linalg.norm(block, axis=1)
+    norms[norms == 0] = 1.0
+    return norms
+
+
+def _normalized_block(vectors, norms, start, stop):
+    return np.asarray(vectors[start:stop], dtype=np.float32) / norms[start:stop, None]
+
+
+def iter_similar_pairs(vectors, threshold=0.8, block_size=2048):
+    """cosine 유사도가 threshold 를 넘는 (i, j, sim) 을 i < j, (i, j) 순서로 반환합니다."""
+    n = len(vectors)
+    norms = _row_norms(vectors, block_size)
+
+    for row_start in range(0, n, block_size):
+        row_stop = min(row_start + block_size, n)
+        rows = _normalized_block(vectors, norms, row_start, row_stop)
+
+        found_i, found_j, found_sim = [], [], []
+        for col_start in range(row_start, n, block_size):
+            col_stop = min(col_start + block_size, n)
+            cols = rows if col_start == row_start else _normalized_block(vectors, norms, col_start, col_stop)
+            sims = rows @ cols.T
+            if col_start == row_start:
+                # 대각선 블록은 상삼각(i < j)만 사용
+                sims[np.tril_indices(len(rows))] = -np.inf
+            ii, jj = np.nonzero(sims > threshold)
+            if len(ii):
+                found_i.append(ii + row_start)
+                found_j.append(jj + col_start)
+                found_sim.append(sims[ii, jj])
+
+        if not found_i:
+            continue
+        ii = np.concatenate(found_i)
+        jj = np.concatenate(found_j)
+        ss = np.concatenate(found_sim)
+        order = np.lexsort((jj, ii))
+        for i, j, sim in zip(ii[order], jj[order], ss[order]):
+            yield int(i), int(j), float(sim)
+
+
+def iter_similar_pairs_lsh(vectors, threshold=0.8, n_bits=16, n_tables=4, seed=0, block_size=2048):
+    """random projection LSH 버킷 안에서만 비교하는 근사 버전 (재현율 < 1)."""
+    n = len(vectors)
+    if n < 2:
+        return
+    norms = _row_norms(vectors, block_size)
+    dim = np.asarray(vectors[:1]).shape[1]
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((n_tables, dim, n_bits)).astype(np.float32)
+    weights = (1 << np.arange(n_bits)).astype(np.int64)
+
+    # 테이블별 해시 코드 (N x n_tables), 블록 단위로 계산
+    codes = np.empty((n, n_tables), dtype=np.int64)
+    for start in range(0, n, block_size):
+        block = _normalized_block(vectors, norms, start, min(start + block_size, n))
+        for t in range(n_tables):
+            codes[start:start + len(block), t] = ((block @ planes[t]) > 0) @ weights
+
+    found = {}
+    for t in range(n_tables):
+        order = np.argsort(codes[:, t], kind="stable")
+        sorted_codes = codes[order, t]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2:
+                continue
+            bucket = np.sort(bucket)
+            for start in range(0, len(bucket), block_size):
+                members = bucket[start:start + block_size]
+                rows = np.asarray(vectors[members], dtype=np.float32) / norms[members, None]
+                cols_idx = bucket[start:]
+                cols = np.asarray(vectors[cols_idx], dtype=np.float32) / norms[cols_idx, None]
+                sims = rows @ cols.T
+                ii, jj = np.nonzero(sims > threshold)
+                for a, b in zip(ii, jj):
+                    i, j = int(members[a]), int(cols_idx[b])
+                    if i < j:
+                        found[(i, j)] = float(sims[a, b])
+    for (i, j) in sorted(found):
+        yield i, j, found[(i, j)]
+
+
+def find_similar_pairs(labels, vectors, threshold=0.8, key_a="Text A", key_b="Text B",
+                       block_size=2048, method="blocked", **lsh_kwargs):
+    """similar_pairs 레코드({key_a, key_b, "Cosine Similarity"}) 리스트를 반환합니다."""
+    if method == "lsh":
+        pairs = iter_similar_pairs_lsh(vectors, threshold=threshold, block_size=block_size, **lsh_kwargs)
+    else:
+        pairs = iter_similar_pairs(vectors, threshold=threshold, block_size=block_size)
+    return [
+        {
+            key_a: labels[i],
+            key_b: labels[j],
+            "Cosine Similarity": round(sim, 4)
+        }
+        for i, j, sim in pairs
+    ]
@@ -0,0 +1,177 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from question_tagging import ENTITY_PATTERNS, LOCAL_PATTERNS, compile_patterns, find_entities
+
+# ==========================================
+# 질문 태깅 결과 캐시 (q_improvement)
+# ==========================================
+# - 문의 티켓은 ID 만 바뀐 같은 문장이 반복되므로, 정규식 엔티티를 "@TYPE#i" 로 가린(masking) 문장을 키로 사용
+# - 값: Step 2 태그 + 최종 재작성 문장 (가린 값은 placeholder 로 저장했다가 조회 시 현재 질문의 값으로 채움)
+# - 메모리는 max_entries 까지만 유지 (LRU), ttl_seconds 가 지난 항목은 무효
+# - path 를 주면 SQLite 에도 저장해 프로세스 재시작 후에도 재사용
+
+MASK_RE = compile_patterns({**ENTITY_PATTERNS, **LOCAL_PATTERNS})
+_PLACEHOLDER_RE = re.compile(r"@([A-Z_]+)#(\d+)")
+
+
+def normalize_text(text):
+    # 재작성 결과를 그대로 돌려주므로 대소문자는 유지하고 유니코드/공백 차이만 없앰
+    # store() 에 넘기는 재작성 문장은 이 함수를 거친 질문으로 만들어야 ID 가 placeholder 로 바뀜
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def mask_question(question, compiled=MASK_RE):
+    """(가린 문장, {placeholder: 값}) 을 반환합니다. 같은 값은 같은 placeholder 를 씁니다."""
+    question = normalize_text(question)
+    values = {}
+    placeholder_of = {}
+    counts = {}
+    parts = []
+    last = 0
+    for tag in find_entities(question, compiled):
+        placeholder = placeholder_of.get(tag["value"])
+        if placeholder is None:
+            index = counts.get(tag["type"], 0)
+            counts[tag["type"]] = index + 1
+            placeholder = f"@{tag['type']}#{index}"
+            placeholder_of[tag["value"]] = placeholder
+            values[placeholder] = tag["value"]
+        parts.append(question[last:tag["start"]])
+        parts.append(placeholder)
+        last = tag["end"]
+    parts.append(question[last:])
+    return "".join(parts), values
+
+
+def _to_template(text, values):
+    for placeholder, value in sorted(values.items(), key=lambda item: -len(item[1])):
+        text = text.replace(value, placeholder)
+    return text
+
+
+def _fill(text, values):
+    return _PLACEHOLDER_RE.sub(lambda m: values.get(m.group(), m.group()), text)
+
+
+class TaggingCache:
+    def __init__(self, max_entries=10000, ttl_seconds=86400, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._entries = OrderedDict()  # key -> (created, value) (LRU 순서)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS tagging_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tagging_created ON tagging_cache (created)")
+            self._conn.commit()
+
+    def _remember(self, key, created, value):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key, now):
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT value, created FROM tagging_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl_seconds:
+            return None
+        value = json.loads(row[0])
+        self._remember(key, row[1], value)
+        self.disk_hits += 1
+        return value
+
+    def key(self, question):
+        return mask_question(question)[0]
+
+    def fill(self, question, value):
+        """저장된(템플릿) 값을 현재 질문의 ID 로 채운 {"step2_tags", "rewrite"} 를 반환합니다."""
+        values = mask_question(question)[1]
+        return {
+            "step2_tags": [{**tag, "value": _fill(tag["value"], values)} for tag in value["step2_tags"]],
+            "rewrite": _fill(value["rewrite"], values),
+        }
+
+    def lookup(self, question):
+        """{"step2_tags", "rewrite"} 를 현재 질문의 값으로 채워 반환하고, 없으면 None 을 반환합니다."""
+        key = self.key(question)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                value = entry[1]
+            else:
+                value = self._load(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self.fill(question, value)
+
+    def store(self, question, step2_tags, rewrite):
+        """템플릿으로 바꿔 저장하고 그 값을 반환합니다. rewrite 는 normalize_text(question) 으로 만든 문장이어야 합니다."""
+        key, values = mask_question(question)
+        value = {
+            # span 은 질문마다 달라지므로 저장하지 않음
+            "step2_tags": [
+                {"type": tag["type"], "value": _to_template(tag["value"], values)} for tag in step2_tags
+            ],
+            "rewrite": _to_template(rewrite, values),
+        }
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tagging_cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now),
+                )
+                self._conn.execute("DELETE FROM tagging_cache WHERE created < ?", (now - self.ttl_seconds,))
+                self._conn.commit()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM tagging_cache")
+                self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
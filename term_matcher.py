@@ -0,0 +1,85 @@
+# ==========================================
+# 다중 용어 매칭 (Aho–Corasick)
+# ==========================================
+# 용어 목록으로 오토마톤을 한 번만 만들고, 청크당 한 번의 스캔으로
+# 모든 용어의 (start, end) 위치를 찾습니다. 겹치는 용어("rg", "rg 라인")도 모두 반환합니다.
+# word boundary 판정은 정규식 \b 와 같은 규칙(단어 문자 ↔ 비단어 문자 경계)을 따릅니다.
+
+from collections import deque
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class TermMatcher:
+    def __init__(self, terms, left_boundary=True, right_boundary=True):
+        self.terms = list(dict.fromkeys(str(term) for term in terms if term))
+        self.left_boundary = left_boundary
+        self.right_boundary = right_boundary
+
+        # goto / fail / output 테이블 구성
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, term in enumerate(self.terms):
+            state = 0
+            for ch in term:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(index)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _is_boundary(self, text, pos):
+        before = pos > 0 and _is_word_char(text[pos - 1])
+        after = pos < len(text) and _is_word_char(text[pos])
+        return before != after
+
+    def finditer(self, text):
+        """(start, end, term) 을 끝 위치 순서대로 반환합니다."""
+        goto, fail, out, terms = self._goto, self._fail, self._out, self.terms
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = pos + 1
+            for index in out[state]:
+                start = end - len(terms[index])
+                if self.left_boundary and not self._is_boundary(text, start):
+                    continue
+                if self.right_boundary and not self._is_boundary(text, end):
+                    continue
+                yield start, end, terms[index]
+
+    def find_all(self, text):
+        """모든 매치를 (start, end) 순으로 정렬해 반환합니다."""
+        return sorted(self.finditer(text), key=lambda match: (match[0], match[1]))
+
+    def find_longest(self, text):
+        """겹치는 매치 중 왼쪽부터 가장 긴 것만 남겨 반환합니다."""
+        selected = []
+        last_end = -1
+        for start, end, term in sorted(self.finditer(text), key=lambda match: (match[0], -match[1])):
+            if start >= last_end:
+                selected.append((start, end, term))
+                last_end = end
+        return selected